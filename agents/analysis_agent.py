@@ -1,4 +1,4 @@
-import re
+from agents import dedup_agent
 
 def analyze_portfolio_risk(current_portfolio: dict, previous_portfolio: dict, earnings_data: list) -> dict:
     """
@@ -28,14 +28,15 @@ def analyze_portfolio_risk(current_portfolio: dict, previous_portfolio: dict, ea
     negative_keywords = ['miss', 'missed', 'misses', 'plunge', 'weak', 'falls', 'glut']
 
     for headline in earnings_data:
-        ticker_match = re.search(r'\[(.*?)\]', headline)
-        ticker = ticker_match.group(1) if ticker_match else "Unknown"
+        # A collapsed story can be tagged with several tickers: "[2330.TW, TSM] ..."
+        tickers, _ = dedup_agent.split_headline(headline)
         
         headline_lower = headline.lower()
-        if any(keyword in headline_lower for keyword in positive_keywords):
-            sentiment_summary_lines.append(f"{ticker}: Positive sentiment detected in news.")
-        elif any(keyword in headline_lower for keyword in negative_keywords):
-            sentiment_summary_lines.append(f"{ticker}: Negative sentiment detected in news.")
+        for ticker in tickers:
+            if any(keyword in headline_lower for keyword in positive_keywords):
+                sentiment_summary_lines.append(f"{ticker}: Positive sentiment detected in news.")
+            elif any(keyword in headline_lower for keyword in negative_keywords):
+                sentiment_summary_lines.append(f"{ticker}: Negative sentiment detected in news.")
             
     # Assemble Final Analysis 
     analysis = {
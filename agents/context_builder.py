@@ -0,0 +1,121 @@
+import os
+import re
+from collections import OrderedDict
+
+from agents import dedup_agent
+
+# --- Configuration ---
+# Upper bound on the tokens spent on the three context sections of the summary prompt, section
+# headers and "- None" placeholders included (they are always rendered, so the floor is their cost)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1200"))
+
+_CJK = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯]')
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: ~4 characters per token for Latin text, one per CJK character."""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _ticker_weight(tickers: list, weights: dict) -> float:
+    return max((weights.get(ticker, 0) for ticker in tickers), default=0)
+
+def _news_items(news: list, scores: list, weights: dict) -> list:
+    """Retrieved snippets ranked by relevance (L2 distance, lower is better) boosted by allocation weight."""
+    ranked = []
+    for position, headline in enumerate(news):
+        distance = scores[position] if position < len(scores) else float("inf")
+        tickers, _ = dedup_agent.split_headline(headline)
+        ranked.append((distance / (1 + _ticker_weight(tickers, weights)), f"- {headline}"))
+    ranked.sort(key=lambda item: item[0])
+    return [line for _, line in ranked]
+
+def _sentiment_items(sentiment_lines: list, weights: dict) -> list:
+    """One line per ticker ("TSM: 3 positive, 1 negative headlines"), heaviest holdings first."""
+    counts = OrderedDict()
+    for line in sentiment_lines:
+        ticker, _, rest = line.partition(":")
+        if not rest:
+            counts.setdefault(line, None)  # Not a per-ticker line (e.g. "No news with strong sentiment...")
+            continue
+        tally = counts.setdefault(ticker.strip(), {"positive": 0, "negative": 0})
+        if tally is not None:
+            tally["positive" if "Positive" in rest else "negative"] += 1
+    items = []
+    for ticker, tally in counts.items():
+        if tally is None:
+            items.append((0, f"- {ticker}"))
+        else:
+            parts = [f"{count} {kind}" for kind, count in tally.items() if count]
+            items.append((weights.get(ticker, 0), f"- {ticker}: {', '.join(parts)} headlines"))
+    items.sort(key=lambda item: -item[0])
+    return [line for _, line in items]
+
+def _portfolio_items(portfolio: dict) -> list:
+    holdings = sorted(portfolio.items(), key=lambda item: -item[1].get("allocation", 0))
+    return [
+        f"- {ticker}{' (' + details['name'] + ')' if details.get('name') else ''}: {details.get('allocation', 0) * 100:.0f}%"
+        for ticker, details in holdings
+    ]
+
+
+_CONTEXT_KEYS = ("retrieved_news", "analysis_summary", "portfolio_data")
+
+
+def _render(kept: dict) -> dict:
+    analysis_text = "Sentiment by ticker:\n" + ("\n".join(kept["sentiment"]) or "- None")
+    analysis_text += "\nAllocation changes:\n" + ("\n".join(kept["changes"]) or "- None")
+    return {
+        "retrieved_news": "\n".join(kept["retrieved_news"]) or "- None",
+        "analysis_summary": analysis_text,
+        "portfolio_data": "\n".join(kept["portfolio_data"]) or "- None",
+    }
+
+
+def _context_tokens(context: dict) -> int:
+    return sum(estimate_tokens(context[key]) for key in _CONTEXT_KEYS)
+
+
+def build_summary_context(state: dict, token_budget: int = PROMPT_TOKEN_BUDGET) -> dict:
+    """
+    Renders the context sections of the summary prompt compactly and trims them to the
+    token budget. Lines are admitted in priority order: retrieved news, per-ticker sentiment,
+    allocation changes, then holdings. Returns the prompt inputs plus size statistics.
+    """
+    portfolio = state.get("portfolio_data") or {}
+    analysis = state.get("analysis_summary") or {}
+    weights = {ticker: details.get("allocation", 0) for ticker, details in portfolio.items()}
+
+    sections = OrderedDict([
+        ("retrieved_news", _news_items(state.get("retrieved_news") or [], state.get("retrieval_scores") or [], weights)),
+        ("sentiment", _sentiment_items(analysis.get("portfolio_sentiment_analysis", []), weights)),
+        ("changes", [f"- {line}" for line in analysis.get("portfolio_change_analysis", [])]),
+        ("portfolio_data", _portfolio_items(portfolio)),
+    ])
+
+    kept = {name: [] for name in sections}
+    # Headers and placeholders are rendered whatever fits, so lines share what they leave over
+    used = _context_tokens(_render(kept))
+    dropped = 0
+    for name, lines in sections.items():
+        for line in lines:
+            cost = estimate_tokens(line) + 1
+            if used + cost > token_budget:
+                dropped += 1
+                continue
+            kept[name].append(line)
+            used += cost
+
+    context = {"user_query": state.get("user_query", ""), **_render(kept)}
+
+    # What the prompt used to receive: the Python reprs of the raw state values
+    tokens_before = sum(estimate_tokens(str(state.get(key))) for key in _CONTEXT_KEYS)
+    tokens_after = _context_tokens(context)
+    context["prompt_stats"] = {
+        "context_tokens_before": tokens_before,
+        "context_tokens_after": tokens_after,
+        "token_budget": token_budget,
+        "lines_dropped": dropped,
+    }
+    return context
@@ -0,0 +1,107 @@
+import re
+import hashlib
+import threading
+import numpy as np
+
+# --- Configuration ---
+# Headlines are compared by the Jaccard similarity of their shingle sets (words plus character
+# bigrams). Syndicated copies that drop a word or rephrase a term ("Q3" -> "third-quarter")
+# score about 0.7-0.9, different stories about the same company stay below about 0.55.
+MIN_JACCARD = 0.6
+# MinHash signatures split into LSH bands: pairs at or above MIN_JACCARD share a band with
+# probability > 0.98, so candidates are found by exact band lookups instead of comparing every
+# pair; each candidate is then confirmed with the exact Jaccard similarity.
+NUM_PERMUTATIONS = 128
+BANDS = 32
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, _MERSENNE_PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _MERSENNE_PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+_HEADLINE = re.compile(r'^\[(.*?)\]\s*(.*)$', re.DOTALL)
+_TOKEN = re.compile(r'\w+')
+_CJK = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯]')
+
+_stats_lock = threading.Lock()
+_stats = {"headlines_in": 0, "documents_out": 0, "embeddings_saved": 0}
+
+
+def split_headline(headline: str) -> tuple:
+    """Splits "[T1, T2] title" into (["T1", "T2"], "title")."""
+    match = _HEADLINE.match(headline)
+    if not match:
+        return ["Unknown"], headline.strip()
+    tickers = [ticker.strip() for ticker in match.group(1).split(",") if ticker.strip()]
+    return tickers or ["Unknown"], match.group(2).strip()
+
+def shingles(title: str) -> set:
+    """Words plus their character bigrams; scripts written without spaces (CJK) use character bigrams only."""
+    result = set()
+    for token in _TOKEN.findall(title.lower()):
+        if not _CJK.search(token):
+            result.add(token)
+        result.update(token[i:i + 2] for i in range(len(token) - 1))
+    return result
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+def minhash(shingle_set: set) -> np.ndarray:
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "big") & _MERSENNE_PRIME
+         for shingle in shingle_set),
+        dtype=np.uint64, count=len(shingle_set))
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+def _bands(signature: np.ndarray) -> list:
+    return [(band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()) for band in range(BANDS)]
+
+def collapse_near_duplicates(headlines: list) -> list:
+    """
+    Collapses exact and near-duplicate headlines (syndicated copies with small wording
+    changes) into one canonical document per story, in first-seen order. The canonical
+    document keeps the first wording and lists every ticker the story was seen under,
+    e.g. "[2330.TW, TSM] TSMC forecasts strong Q3 revenue".
+    """
+    documents = []  # [tickers, title, shingles]
+    buckets = {}    # (band, band rows) -> indexes into documents
+
+    for headline in headlines:
+        tickers, title = split_headline(headline)
+        title_shingles = shingles(title)
+        if not title_shingles:
+            continue  # Empty or punctuation-only titles carry no story
+        band_keys = _bands(minhash(title_shingles))
+
+        match = None
+        for band_key in band_keys:
+            for index in buckets.get(band_key, ()):
+                if jaccard(documents[index][2], title_shingles) >= MIN_JACCARD:
+                    match = index
+                    break
+            if match is not None:
+                break
+
+        if match is None:
+            for band_key in band_keys:
+                buckets.setdefault(band_key, []).append(len(documents))
+            documents.append([list(tickers), title, title_shingles])
+        else:
+            known = documents[match][0]
+            known.extend(ticker for ticker in tickers if ticker not in known)
+
+    collapsed = [f"[{', '.join(tickers)}] {title}" for tickers, title, _ in documents]
+
+    saved = len(headlines) - len(collapsed)
+    with _stats_lock:
+        _stats["headlines_in"] += len(headlines)
+        _stats["documents_out"] += len(collapsed)
+        _stats["embeddings_saved"] += saved
+    print(f"Collapsed {len(headlines)} headlines into {len(collapsed)} documents ({saved} embeddings saved).")
+    return collapsed
+
+def stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,256 @@
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+import numpy as np
+from typing import List
+
+# --- Configuration ---
+# EMBEDDING_BACKEND selects how sentences are embedded:
+#   - "torch":     the sentence-transformers model running on PyTorch (original behaviour)
+#   - "onnx":      the same model exported to ONNX and run with ONNX Runtime (no torch at query time)
+#   - "onnx-int8": the ONNX export with dynamic int8 weight quantization (smallest and fastest on CPU)
+MODEL_NAME = 'all-MiniLM-L6-v2'
+BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(PROJECT_ROOT, "onnx_models", MODEL_NAME))
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+MAX_SEQ_LENGTH = 256  # Same truncation length sentence-transformers uses for this model
+
+_embedders = {}
+_embedders_lock = threading.Lock()
+
+
+def backend_id(backend: str = None) -> str:
+    """
+    Returns the identifier stored alongside vectors, e.g. "all-MiniLM-L6-v2:onnx-int8".
+    Vectors produced under different identifiers must never share an index.
+    """
+    return f"{MODEL_NAME}:{backend or EMBEDDING_BACKEND}"
+
+
+class TorchEmbedder:
+    """Embeds text with the sentence-transformers model on PyTorch."""
+
+    def __init__(self):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(MODEL_NAME, device="cpu")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(texts, convert_to_tensor=False)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+class OnnxEmbedder:
+    """
+    Embeds text with an ONNX export of the model through ONNX Runtime.
+    Reproduces the sentence-transformers pipeline (mean pooling + L2 normalization)
+    with numpy so that PyTorch is never imported at query time.
+    """
+
+    def __init__(self, quantized: bool = False):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_file = ONNX_INT8_FILE if quantized else ONNX_FP32_FILE
+        model_path = os.path.join(ONNX_MODEL_DIR, model_file)
+        if not os.path.exists(model_path):
+            print(f"ONNX model not found at {model_path}. Exporting it now...")
+            export_onnx_model(quantize=quantized)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        intra_op_threads = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(ONNX_MODEL_DIR, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        feeds = {name: value for name, value in feeds.items() if name in self.input_names}
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real (non-padding) tokens, then L2 normalization
+        mask = attention_mask[..., np.newaxis].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return np.ascontiguousarray(pooled / norms, dtype=np.float32)
+
+
+def export_onnx_model(quantize: bool = True):
+    """
+    Exports the transformer of the sentence-transformers model to ONNX_MODEL_DIR,
+    and optionally writes a dynamically int8-quantized copy next to it.
+    This is the only step of the ONNX backends that needs PyTorch.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(ONNX_MODEL_DIR, exist_ok=True)
+    fp32_path = os.path.join(ONNX_MODEL_DIR, ONNX_FP32_FILE)
+
+    if not os.path.exists(fp32_path):
+        st_model = SentenceTransformer(MODEL_NAME, device="cpu")
+        hf_tokenizer = st_model.tokenizer
+        hf_tokenizer.save_pretrained(ONNX_MODEL_DIR)  # Writes tokenizer.json for the `tokenizers` runtime
+
+        class _TokenEmbeddings(torch.nn.Module):
+            def __init__(self, transformer):
+                super().__init__()
+                self.transformer = transformer
+
+            def forward(self, input_ids, attention_mask, token_type_ids):
+                return self.transformer(
+                    input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+                )[0]
+
+        wrapped = _TokenEmbeddings(st_model[0].auto_model).eval()
+        dummy = hf_tokenizer(["Export sample headline"], return_tensors="pt")
+        input_names = ["input_ids", "attention_mask", "token_type_ids"]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                wrapped,
+                tuple(dummy[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["token_embeddings"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+                dynamo=False,  # TorchScript exporter; newer torch defaults to dynamo, which needs onnxscript
+            )
+        print(f"Exported ONNX model to {fp32_path}")
+
+    int8_path = os.path.join(ONNX_MODEL_DIR, ONNX_INT8_FILE)
+    if quantize and not os.path.exists(int8_path):
+        import importlib.util
+        if importlib.util.find_spec("onnx") is None:
+            # onnxruntime does not depend on it, but its quantization tools import it
+            raise ImportError("The onnx-int8 backend needs the 'onnx' package to quantize the model: uv pip install onnx")
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"Wrote int8-quantized ONNX model to {int8_path}")
+
+
+def get_embedder(backend: str = None):
+    """Returns the (lazily created, process-wide) embedder for the given backend."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'. Expected one of {BACKENDS}.")
+    with _embedders_lock:
+        if backend not in _embedders:
+            if backend == "torch":
+                _embedders[backend] = TorchEmbedder()
+            else:
+                _embedders[backend] = OnnxEmbedder(quantized=(backend == "onnx-int8"))
+        return _embedders[backend]
+
+
+# --- Benchmark: latency, RSS and retrieval agreement against the torch baseline ---
+
+BENCHMARK_CORPUS = [
+    "[2330.TW] TSMC forecasts strong Q3 revenue, citing massive AI chip demand.",
+    "[2330.TW] TSMC shares fall as investors weigh export restrictions.",
+    "[005930.KS] Samsung Electronics flags a likely 96% plunge in Q2 profit due to a chip glut.",
+    "[005930.KS] Samsung beats memory price expectations as HBM orders rise.",
+    "[9988.HK] Alibaba beats revenue estimates on e-commerce strength, but margins fell.",
+    "[9988.HK] Alibaba cloud unit posts weak growth amid price cuts.",
+    "[TCEHY] Tencent gaming revenue rises on strong domestic titles.",
+    "[TCEHY] Tencent misses advertising estimates as competition intensifies.",
+    "[2330.TW] 台積電第三季營收創新高，AI晶片需求強勁",
+    "[005930.KS] 삼성전자 2분기 영업이익 급감 전망",
+]
+BENCHMARK_QUERIES = [
+    "How is TSMC doing?",
+    "Any earnings misses in my portfolio?",
+    "What happened to Samsung profits?",
+    "Is Alibaba's cloud business growing?",
+    "Tencent advertising",
+]
+
+
+def _benchmark_single_backend(backend: str, k: int = 3, repeats: int = 50) -> dict:
+    """Runs inside a fresh interpreter so that RSS reflects only this backend."""
+    import resource
+
+    start = time.perf_counter()
+    embedder = get_embedder(backend)
+    embedder.encode(["warm up"])
+    load_seconds = time.perf_counter() - start
+
+    corpus_vectors = embedder.encode(BENCHMARK_CORPUS)
+    latencies = []
+    top_k = []
+    for query in BENCHMARK_QUERIES:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            query_vector = embedder.encode([query])
+            latencies.append((time.perf_counter() - start) * 1000)
+        distances = ((corpus_vectors - query_vector) ** 2).sum(axis=1)
+        top_k.append([int(i) for i in np.argsort(distances)[:k]])
+
+    latencies.sort()
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),  # Linux reports KiB
+        "top_k": top_k,
+    }
+
+
+def benchmark_backends(backends=BACKENDS):
+    """Benchmarks each backend in its own subprocess and prints a comparison table."""
+    results = {}
+    for backend in backends:
+        completed = subprocess.run(
+            [sys.executable, "-m", "agents.embedding_backend", "--benchmark-one", backend],
+            cwd=PROJECT_ROOT, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            print(f"Benchmark for {backend} failed:\n{completed.stderr}")
+            continue
+        results[backend] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    baseline = results.get("torch")
+    print(f"{'backend':<10} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'RSS MB':>7} {'top-k agreement':>16}")
+    for backend, result in results.items():
+        agreement = "n/a"
+        if baseline:
+            overlaps = [
+                len(set(a) & set(b)) / len(a)
+                for a, b in zip(result["top_k"], baseline["top_k"])
+            ]
+            agreement = f"{sum(overlaps) / len(overlaps):.0%}"
+        print(f"{backend:<10} {result['load_seconds']:>7} {result['p50_ms']:>7} {result['p95_ms']:>7} {result['max_rss_mb']:>7} {agreement:>16}")
+    return results
+
+
+# Run `python -m agents.embedding_backend` from the project root to compare backends
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == "--benchmark-one":
+        print(json.dumps(_benchmark_single_backend(sys.argv[2])))
+    elif len(sys.argv) == 2 and sys.argv[1] == "--export":
+        export_onnx_model(quantize=True)
+    else:
+        print("--- Embedding Backend Benchmark ---")
+        benchmark_backends()
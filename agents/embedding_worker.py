@@ -0,0 +1,229 @@
+import os
+import time
+import queue
+import threading
+from collections import deque
+import multiprocessing
+import numpy as np
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List
+
+from agents import embedding_backend
+
+# --- Configuration ---
+# Encode requests from all in-flight queries are queued and flushed as one batch
+# once MAX_BATCH_SIZE texts are waiting or MAX_WAIT_MS has passed since the first one.
+# Larger submissions (index builds) skip the micro-batch: they are encoded one
+# MAX_BATCH_SIZE chunk at a time, with waiting queries served between chunks.
+MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+# "thread": run the model in this process on a dedicated thread.
+# "process": run the model in a separate process; batching still happens here.
+WORKER_MODE = os.getenv("EMBEDDING_WORKER_MODE", "thread")
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _process_encode(backend: str, texts: List[str]) -> np.ndarray:
+    """Runs in the child process; the embedder is created once per process and reused."""
+    return embedding_backend.get_embedder(backend).encode(texts)
+
+
+class EmbeddingWorker:
+    """
+    Micro-batching front end for an embedder. Callers submit lists of texts and get a
+    Future for their vectors; a single dispatcher thread coalesces concurrent submissions
+    into batched forward passes.
+    """
+
+    def __init__(self, backend: str = None, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_ms: float = MAX_WAIT_MS, mode: str = WORKER_MODE):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown EMBEDDING_WORKER_MODE '{mode}'. Expected 'thread' or 'process'.")
+        self.backend = backend or embedding_backend.EMBEDDING_BACKEND
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.mode = mode
+        self._queue = queue.Queue()
+        self._executor = None
+        if mode == "process":
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "texts": 0, "batches": 0, "largest_batch": 0}
+        self._thread = threading.Thread(target=self._run, name="embedding-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queues texts for embedding and returns a Future resolving to a float32 array."""
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def encode(self, texts: List[str], timeout: float = None) -> np.ndarray:
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(texts).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_batch"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._executor:
+            self._executor.shutdown()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self._executor:
+            return self._executor.submit(_process_encode, self.backend, texts).result()
+        return embedding_backend.get_embedder(self.backend).encode(texts)
+
+    def _run(self):
+        bulk = deque()  # Large submissions in progress: [texts, future, encoded chunks]
+        while True:
+            batch, stop = self._collect(bulk)
+            if batch:
+                self._flush(batch)
+            if stop:
+                while bulk:
+                    self._encode_bulk_chunk(bulk)
+                return
+            if bulk:
+                # One chunk per turn, so a query never waits for a whole index build
+                self._encode_bulk_chunk(bulk)
+
+    def _collect(self, bulk: deque) -> tuple:
+        """
+        Gathers queued query submissions into one micro-batch and moves large ones to `bulk`.
+        Blocks only while there is no bulk work. Returns (batch, stop).
+        """
+        batch = []
+        pending_texts = 0
+        deadline = None
+        while pending_texts < self.max_batch_size:
+            if deadline is None:
+                timeout = 0 if bulk else None
+            else:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+            try:
+                item = self._queue.get(block=timeout != 0, timeout=timeout or None)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            texts, future = item
+            if len(texts) > self.max_batch_size:
+                if future.set_running_or_notify_cancel():
+                    bulk.append([texts, future, []])
+                continue
+            if deadline is None:
+                deadline = time.monotonic() + self.max_wait
+            batch.append(item)
+            pending_texts += len(texts)
+        return batch, False
+
+    def _encode_bulk_chunk(self, bulk: deque):
+        texts, future, chunks = bulk[0]
+        done = sum(len(chunk) for chunk in chunks)
+        try:
+            chunks.append(self._encode(texts[done:done + self.max_batch_size]))
+        except Exception as e:
+            bulk.popleft()
+            future.set_exception(e)
+            return
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(chunks[-1]))
+        if done + len(chunks[-1]) >= len(texts):
+            bulk.popleft()
+            future.set_result(np.concatenate(chunks))
+            with self._stats_lock:
+                self._stats["requests"] += 1
+                self._stats["texts"] += len(texts)
+
+    def _flush(self, batch: list):
+        # Drop requests whose callers already gave up
+        batch = [(texts, future) for texts, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [text for item_texts, _ in batch for text in item_texts]
+        try:
+            # The last submission can push a batch past max_batch_size; keep each forward pass bounded
+            chunks = [
+                self._encode(texts[start:start + self.max_batch_size])
+                for start in range(0, len(texts), self.max_batch_size)
+            ]
+            vectors = np.concatenate(chunks) if chunks else np.zeros((0, 0), dtype=np.float32)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for item_texts, future in batch:
+            future.set_result(vectors[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+
+        with self._stats_lock:
+            self._stats["requests"] += len(batch)
+            self._stats["texts"] += len(texts)
+            self._stats["batches"] += len(chunks)
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], min(len(texts), self.max_batch_size))
+
+
+def get_embedding_worker() -> EmbeddingWorker:
+    """Returns the process-wide embedding worker, starting it on first use."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = EmbeddingWorker()
+        return _worker
+
+
+# --- Throughput benchmark: direct batch-of-one encodes vs. the micro-batching worker ---
+
+def _measure_throughput(encode_one, concurrency: int, queries_per_client: int) -> float:
+    queries = embedding_backend.BENCHMARK_QUERIES
+    def client(client_id):
+        for i in range(queries_per_client):
+            encode_one(queries[(client_id + i) % len(queries)])
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    return concurrency * queries_per_client / (time.perf_counter() - start)
+
+
+# Run `python -m agents.embedding_worker` from the project root for throughput numbers
+if __name__ == '__main__':
+    print("--- Embedding Worker Throughput Benchmark ---")
+    print(f"backend={embedding_backend.EMBEDDING_BACKEND} mode={WORKER_MODE} max_batch={MAX_BATCH_SIZE} max_wait_ms={MAX_WAIT_MS}")
+    embedder = embedding_backend.get_embedder()
+    worker = get_embedding_worker()
+    worker.encode(["warm up"])
+    print(f"{'concurrency':>11} {'direct q/s':>11} {'batched q/s':>12} {'speedup':>8}")
+    for concurrency in (1, 4, 16, 64):
+        direct = _measure_throughput(lambda q: embedder.encode([q]), concurrency, 20)
+        batched = _measure_throughput(lambda q: worker.encode([q]), concurrency, 20)
+        print(f"{concurrency:>11} {direct:>11.1f} {batched:>12.1f} {batched / direct:>7.2f}x")
+    # A query arriving during an index build waits for at most one chunk, not the whole build
+    build_start = time.perf_counter()
+    build = worker.submit([f"{text} #{i}" for i in range(200) for text in embedding_backend.BENCHMARK_CORPUS])
+    latencies = []
+    while not build.done():
+        start = time.perf_counter()
+        worker.encode([embedding_backend.BENCHMARK_QUERIES[0]])
+        latencies.append((time.perf_counter() - start) * 1000)
+    build.result()
+    build_seconds = time.perf_counter() - build_start
+    latencies.sort()
+    if latencies:
+        print(f"Query latency during a 2000-document index build ({build_seconds:.1f} s): "
+              f"p50 {latencies[len(latencies) // 2]:.1f} ms, max {latencies[-1]:.1f} ms ({len(latencies)} queries)")
+    print("Worker stats:", worker.stats())
+    worker.close()
@@ -4,30 +4,50 @@ from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
 
+from agents import rate_limits
+
 # Load environment variables from .env file (for GOOGLE_API_KEY)
 load_dotenv()
 
+LLM_MODEL = "gemini-2.5-flash"
+
+
+class LLMError(Exception):
+    """Raised when the LLM cannot be initialized or fails to generate a response."""
+
+# Point the Gemini client at another endpoint (e.g. a local fake upstream for load tests)
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+def get_llm() -> ChatGoogleGenerativeAI:
+    """Creates the Gemini chat model used by every agent and graph node."""
+    if GEMINI_API_ENDPOINT:
+        return ChatGoogleGenerativeAI(model=LLM_MODEL, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+    return ChatGoogleGenerativeAI(model=LLM_MODEL)
+
 def generate_summary(full_context: dict) -> str:
     """
     Generates a natural language summary using an LLM based on all available context.
 
     Args:
-        full_context (dict): A dictionary containing all data from previous agents:
+        full_context (dict): The prompt inputs, normally rendered by context_builder:
+                             - user_query
                              - portfolio_data
                              - retrieved_news
                              - analysis_summary
 
     Returns:
         str: A coherent, narrative market brief.
+
+    Raises:
+        LLMError: If the LLM cannot be initialized or the call fails.
+        rate_limits.UpstreamSaturated: If the Gemini upstream has no free capacity.
     """
     # Initialize the LLM
     try:
-        # THE ONLY CHANGE IS HERE ---
-        # We are using a newer, more reliable model name.
-        llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+        llm = get_llm()
         
     except Exception as e:
-        return f"Error initializing the LLM. Please check your API key. Details: {e}"
+        raise LLMError(f"Error initializing the LLM. Please check your API key. Details: {e}") from e
 
 # Prompt Template
     prompt_template = """
@@ -69,10 +89,14 @@ def generate_summary(full_context: dict) -> str:
 
     # Invoke the Chain with our context
     try:
-        response = chain.invoke(full_context)
+        with rate_limits.limiter("gemini").acquire():
+            response = chain.invoke(full_context)
         return response.content
+    except rate_limits.UpstreamSaturated:
+        # Let the API layer turn this into a fast 503 instead of a bogus "summary"
+        raise
     except Exception as e:
-        return f"An error occurred while generating the summary: {e}"
+        raise LLMError(f"An error occurred while generating the summary: {e}") from e
 
 
 # This part allows you to test the file directly
@@ -97,7 +121,10 @@ if __name__ == '__main__':
     print("\n--- Sending the following context to the LLM ---")
     print(json.dumps(mock_full_context, indent=2))
 
-    final_summary = generate_summary(mock_full_context)
+    try:
+        final_summary = generate_summary(mock_full_context)
+    except LLMError as e:
+        final_summary = str(e)
 
     print("\n--- AI-Generated Market Brief ---")
     print(final_summary)
\ No newline at end of file
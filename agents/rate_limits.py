@@ -0,0 +1,116 @@
+import os
+import time
+import math
+import threading
+from contextlib import contextmanager
+
+# --- Configuration ---
+# Every outbound dependency gets its own limiter: a concurrency cap (semaphore) and an
+# optional request rate (token bucket). Defaults can be overridden per upstream, e.g.
+# UPSTREAM_GEMINI_CONCURRENCY=8, UPSTREAM_GEMINI_RATE=5 (requests per second, 0 = unlimited).
+DEFAULT_LIMITS = {
+    "gemini": {"concurrency": 4, "rate": 0},
+    "yahoo_rss": {"concurrency": 8, "rate": 0},
+    "openai_audio": {"concurrency": 2, "rate": 0},
+}
+# How long a caller may wait for a slot before the upstream counts as saturated
+ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_ACQUIRE_TIMEOUT", "5"))
+
+
+class UpstreamSaturated(Exception):
+    """Raised when an upstream has no free capacity within the acquire timeout."""
+
+    def __init__(self, upstream: str, retry_after: int):
+        super().__init__(f"Upstream '{upstream}' is saturated; retry after {retry_after}s.")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class UpstreamLimiter:
+    """Concurrency cap plus optional token-bucket rate limit for one upstream."""
+
+    def __init__(self, name: str, concurrency: int, rate: float = 0, acquire_timeout: float = ACQUIRE_TIMEOUT_SECONDS):
+        self.name = name
+        self.concurrency = concurrency
+        self.rate = rate
+        self.acquire_timeout = acquire_timeout
+        self._semaphore = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._tokens = float(max(1, concurrency))
+        self._last_refill = time.monotonic()
+        self._stats = {"admitted": 0, "rejected": 0, "active": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0}
+
+    def _take_token(self, deadline: float) -> bool:
+        """Consumes one token, sleeping until one is available or the deadline passes."""
+        if not self.rate:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(float(max(1, self.concurrency)), self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.acquire_timeout))
+
+    @contextmanager
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.acquire_timeout
+        if not self._semaphore.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise UpstreamSaturated(self.name, self._retry_after())
+        if not self._take_token(deadline):
+            self._semaphore.release()
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise UpstreamSaturated(self.name, self._retry_after())
+
+        waited_ms = (time.monotonic() - start) * 1000
+        with self._lock:
+            self._stats["admitted"] += 1
+            self._stats["active"] += 1
+            self._stats["total_wait_ms"] += waited_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], waited_ms)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._stats["active"] -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_wait_ms"] = round(stats.pop("total_wait_ms") / stats["admitted"], 2) if stats["admitted"] else 0.0
+        stats["max_wait_ms"] = round(stats["max_wait_ms"], 2)
+        stats["concurrency"] = self.concurrency
+        stats["rate"] = self.rate
+        return stats
+
+
+def _from_env(name: str, defaults: dict) -> UpstreamLimiter:
+    prefix = f"UPSTREAM_{name.upper()}"
+    return UpstreamLimiter(
+        name,
+        concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", defaults["concurrency"])),
+        rate=float(os.getenv(f"{prefix}_RATE", defaults["rate"])),
+    )
+
+_limiters = {name: _from_env(name, defaults) for name, defaults in DEFAULT_LIMITS.items()}
+
+
+def limiter(name: str) -> UpstreamLimiter:
+    """Returns the shared limiter for an upstream ("gemini", "yahoo_rss" or "openai_audio")."""
+    return _limiters[name]
+
+def stats() -> dict:
+    return {name: upstream.stats() for name, upstream in _limiters.items()}
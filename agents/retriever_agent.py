@@ -1,50 +1,232 @@
 import os
+import json
+import time
+import hashlib
 import faiss
 import numpy as np
 import pickle
-from sentence_transformers import SentenceTransformer
+import shutil
+import tempfile
+import threading
 from typing import Dict, List, Any
+from collections import OrderedDict
 
+from agents import embedding_backend, embedding_worker
 
-MODEL_NAME = 'all-MiniLM-L6-v2'
-FAISS_INDEX_PATH = 'faiss_index.bin'
-DOCUMENTS_PATH = 'documents.pkl'
-model = SentenceTransformer(MODEL_NAME)
 
-def create_and_store_embeddings(documents: list):
-    """(No changes to this function)"""
+# --- Index store ---
+# Every build is written to a temporary directory and renamed into place as one immutable
+# version directory (index, documents, metadata), named after its corpus and embedding backend.
+# A request searches exactly the version built (or found) for its own headlines. CURRENT.json,
+# replaced atomically, only names the version the scheduled refresh published: the one worker
+# processes answer from.
+INDEX_DIR = os.getenv("INDEX_DIR", "index_store")
+CURRENT_POINTER_PATH = os.path.join(INDEX_DIR, "CURRENT.json")
+# Versions are pruned least recently used first; sessions pinned to a pruned version rebuild it
+KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "8"))
+# Opened versions kept in memory per process (they are memory-mapped, so this is cheap)
+LOADED_VERSIONS = 4
+# Worker processes of the multi-worker server only read what the writer process publishes
+READ_ONLY = os.getenv("SERVER_ROLE") == "worker"
+# Map index files instead of reading them into each process's heap, so all workers share
+# one copy through the page cache (IO_FLAG_MMAP_IFC covers flat indexes on newer faiss)
+MMAP_FLAGS = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+_loaded = OrderedDict()  # version -> (meta, index, documents), least recently used first
+_loaded_lock = threading.Lock()
+
+
+def corpus_hash(documents: list) -> str:
+    """Order-insensitive hash of a headline set; identifies which corpus an index was built from."""
+    digest = hashlib.sha256()
+    for document in sorted(set(documents)):
+        digest.update(document.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+def _atomic_write(path: str, write):
+    """Writes to a temporary file and swaps it in, so readers never see a half-written file."""
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def _version_dir(version: str) -> str:
+    return os.path.join(INDEX_DIR, version)
+
+def _version_paths(version: str) -> tuple:
+    version_dir = _version_dir(version)
+    return os.path.join(version_dir, "index.faiss"), os.path.join(version_dir, "documents.pkl")
+
+def _read_pointer() -> dict:
+    try:
+        with open(CURRENT_POINTER_PATH, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _prune_old_versions(current_version: str):
+    """Deletes all but the KEEP_VERSIONS most recently used versions; processes that still map a deleted file keep it alive."""
+    versions = [name for name in os.listdir(INDEX_DIR)
+                if not name.startswith(".") and os.path.isdir(_version_dir(name))]
+    versions.sort(key=lambda name: os.path.getmtime(_version_dir(name)), reverse=True)
+    pointer = _read_pointer()
+    keep = {current_version, pointer and pointer.get("version")}
+    for version in versions[KEEP_VERSIONS:]:
+        if version not in keep:
+            shutil.rmtree(_version_dir(version), ignore_errors=True)
+
+def index_version(documents: list) -> str:
+    """Name of the index version for these documents under the active embedding backend."""
+    return f"{corpus_hash(documents)}-{embedding_backend.backend_id().replace(':', '_')}"
+
+def has_version(version: str, documents_hash: str = None) -> bool:
+    """Whether `version` is stored (and, if documents_hash is given, was built from that corpus)."""
+    if not version or (documents_hash and not version.startswith(f"{documents_hash}-")):
+        return False
+    return os.path.isdir(_version_dir(version))
+
+def ensure_index(documents: list) -> str:
+    """
+    Returns the index version holding exactly these documents, building it only if it is not
+    stored yet. Returns None if there is nothing to search.
+    """
+    version = index_version(documents)
+    if os.path.isdir(_version_dir(version)):
+        print("Index is already up to date for this headline set; skipping rebuild.")
+        try:
+            os.utime(_version_dir(version))  # Recently used versions survive pruning
+        except OSError:
+            pass
+        return version
+    if READ_ONLY:
+        # The writer process owns index updates; answer from what it published
+        print("Index version for these headlines is not stored; using the published version.")
+        return published_version()
+    return create_and_store_embeddings(documents)
+
+def create_and_store_embeddings(documents: list) -> str:
+    """
+    Embeds the documents with the active embedding backend and stores the FAISS index and the
+    documents as a new version. Returns the version; publish_version() makes it current.
+    """
+    if READ_ONLY:
+        raise RuntimeError("This worker opens the index read-only; the writer process owns index updates.")
     if not documents:
         print("No documents provided to embed.")
-        return
-    embeddings = model.encode(documents, convert_to_tensor=False)
+        return None
+    embeddings = embedding_worker.get_embedding_worker().encode(documents)
     d = embeddings.shape[1]
     index = faiss.IndexFlatL2(d)
     index.add(embeddings)
-    faiss.write_index(index, FAISS_INDEX_PATH)
-    with open(DOCUMENTS_PATH, 'wb') as f:
-        pickle.dump(documents, f)
 
-def retrieve_top_k(query: str, k: int = 3) -> Dict[str, List[Any]]:
+    version = index_version(documents)
+    meta = {"version": version, "backend": embedding_backend.backend_id(), "dimension": d,
+            "count": len(documents), "corpus_hash": corpus_hash(documents), "created_at": time.time()}
+
+    # Build the whole version in a private directory, then rename it into place in one step
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".build-", dir=INDEX_DIR)
+    try:
+        faiss.write_index(index, os.path.join(tmp_dir, "index.faiss"))
+        with open(os.path.join(tmp_dir, "documents.pkl"), 'wb') as f:
+            pickle.dump(documents, f)
+        with open(os.path.join(tmp_dir, "meta.json"), 'w') as f:
+            json.dump(meta, f)
+        os.rename(tmp_dir, _version_dir(version))
+    except OSError:
+        # Another build of the same corpus and backend got there first; its contents are identical
+        if not os.path.isdir(_version_dir(version)):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    _prune_old_versions(version)
+    return version
+
+def publish_version(version: str):
+    """Makes a stored version the published one; worker processes switch to it on their next query."""
+    if READ_ONLY:
+        raise RuntimeError("This worker opens the index read-only; the writer process owns index updates.")
+    pointer = _read_pointer()
+    if pointer and pointer.get("version") == version:
+        return
+    with open(os.path.join(_version_dir(version), "meta.json"), 'r') as f:
+        meta = json.load(f)
+
+    def write_meta(path):
+        with open(path, 'w') as f:
+            json.dump(meta, f)
+
+    _atomic_write(CURRENT_POINTER_PATH, write_meta)
+    print(f"Published index version {version}.")
+
+def published_version() -> str:
+    """Version named by CURRENT.json, or None if nothing has been published yet."""
+    pointer = _read_pointer()
+    return pointer["version"] if pointer else None
+
+def _load_version(version: str):
+    """Returns (meta, index, documents) for a stored version, opening it at most once per process."""
+    with _loaded_lock:
+        if version in _loaded:
+            _loaded.move_to_end(version)
+            return _loaded[version]
+
+    index_path, documents_path = _version_paths(version)
+    with open(os.path.join(_version_dir(version), "meta.json"), 'r') as f:
+        meta = json.load(f)
+    index = faiss.read_index(index_path, MMAP_FLAGS)
+    with open(documents_path, 'rb') as f:
+        documents = pickle.load(f)
+    with _loaded_lock:
+        _loaded[version] = (meta, index, documents)
+        _loaded.move_to_end(version)
+        while len(_loaded) > LOADED_VERSIONS:
+            _loaded.popitem(last=False)
+    print(f"Loaded index version {version} ({meta['count']} documents).")
+    return meta, index, documents
+
+def published_documents() -> list:
+    """Documents of the currently published index (what workers answer from)."""
+    version = published_version()
+    if version is None:
+        return []
+    try:
+        return list(_load_version(version)[2])
+    except FileNotFoundError:
+        return []
+
+def retrieve_top_k(query: str, k: int = 3, version: str = None) -> Dict[str, List[Any]]:
     """
     Retrieves the top k most relevant documents AND their scores.
     NOW RETURNS A DICTIONARY.
+    Searches the given index version (normally the one ensure_index returned for the
+    request's headlines), or the published version if none is given.
     """
 
-    if not os.path.exists(FAISS_INDEX_PATH):
+    version = version or published_version()
+    if version is None:
+        return {"documents": ["Error: Vector database not found."], "scores": []}
+    try:
+        meta, index, documents = _load_version(version)
+    except FileNotFoundError:
+        # Pruned since the caller looked it up
         return {"documents": ["Error: Vector database not found."], "scores": []}
 
-    index = faiss.read_index(FAISS_INDEX_PATH)
-    with open(DOCUMENTS_PATH, 'rb') as f:
-        documents = pickle.load(f)
+    index_backend = meta.get("backend")
+    if index_backend != embedding_backend.backend_id():
+        # Never compare query vectors against an index built by another backend
+        print(f"Index was built with '{index_backend}' but the active backend is '{embedding_backend.backend_id()}'.")
+        return {"documents": ["Error: Vector database was built with a different embedding backend. Please rebuild it."], "scores": []}
+
+    # Batched together with the encodes of other in-flight queries
+    query_vector = embedding_worker.get_embedding_worker().encode([query])
+
 
-    query_vector = model.encode([query])
-    
-  
     distances, indices = index.search(query_vector, k)
 
     valid_indices = [i for i in indices[0] if i != -1]
-    
+
     results = [documents[i] for i in valid_indices]
     scores = [float(d) for d, i in zip(distances[0], indices[0]) if i != -1]
-    
-    return {"documents": results, "scores": scores}
\ No newline at end of file
+
+    return {"documents": results, "scores": scores}
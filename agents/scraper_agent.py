@@ -1,38 +1,206 @@
+import os
+import math
+import time
+import threading
 import requests
-import feedparser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+
+from agents import rate_limits, rss_parser, dedup_agent
+
+# Overridable so the scraper can be pointed at a local fake feed server
+YAHOO_RSS_URL = os.getenv("YAHOO_RSS_URL", "https://feeds.finance.yahoo.com/rss/2.0/headline")
+
+# --- Tail-latency configuration ---
+FEED_TIMEOUT_SECONDS = 10
+# The whole scrape stage returns within this deadline; slow feeds fall back to their last good headlines
+SCRAPE_DEADLINE_SECONDS = float(os.getenv("SCRAPE_DEADLINE_SECONDS", "8"))
+# A duplicate request is sent once a feed is slower than its observed p95; with fewer samples
+# than this the "p95" would just be one of the slowest few requests, so no hedging until then
+HEDGE_MIN_SAMPLES = 20
+# After this many consecutive failures a feed is skipped for the cool-down period
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("FEED_BREAKER_THRESHOLD", "3"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("FEED_BREAKER_COOLDOWN", "300"))
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Separate pools so per-feed tasks never wait on their own HTTP attempts for a thread
+_feed_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="rss-feed")
+_request_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="rss-request")
+
+
+class FeedHealth:
+    """Latency history, circuit-breaker state and last good items/headlines for one feed URL."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=50)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.last_good = []
+        self.last_items = []
+        self.hedges = 0
+        self.served_stale = 0
+
+    def hedge_delay(self):
+        """Observed p95 latency, or None until there are enough samples to trust it."""
+        with self.lock:
+            if len(self.latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        # Nearest-rank percentile: the smallest latency that at least 95% of samples do not exceed
+        return ordered[math.ceil(len(ordered) * 0.95) - 1]
+
+    def is_open(self) -> bool:
+        with self.lock:
+            return time.monotonic() < self.open_until
+
+    def record_success(self, latency: float, headlines: list, items: list):
+        with self.lock:
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            self.last_good = headlines
+            self.last_items = items
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+                # Also re-opens immediately when the single trial request after a cool-down fails
+                self.open_until = time.monotonic() + BREAKER_COOLDOWN_SECONDS
+
+    def fallback(self) -> list:
+        with self.lock:
+            self.served_stale += 1
+            return list(self.last_good)
+
+    def stats(self) -> dict:
+        p95 = self.hedge_delay()
+        with self.lock:
+            return {
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "samples": len(self.latencies),
+                "consecutive_failures": self.consecutive_failures,
+                "circuit_open": time.monotonic() < self.open_until,
+                "hedges": self.hedges,
+                "served_stale": self.served_stale,
+                "last_good_count": len(self.last_good),
+            }
+
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+def _feed_health(url: str) -> FeedHealth:
+    with _feeds_lock:
+        if url not in _feeds:
+            _feeds[url] = FeedHealth()
+        return _feeds[url]
+
+def feed_stats() -> dict:
+    with _feeds_lock:
+        feeds = dict(_feeds)
+    return {url: health.stats() for url, health in feeds.items()}
+
+
+def _fetch_once(url: str) -> tuple:
+    """Returns the raw feed bytes and the charset from the Content-Type header (if any)."""
+    with rate_limits.limiter("yahoo_rss").acquire():
+        response = requests.get(url, headers=HEADERS, timeout=FEED_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    charset = None
+    for param in response.headers.get("Content-Type", "").split(";")[1:]:
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "charset":
+            charset = value.strip('"\' ')
+    return response.content, charset
+
+def _fetch_hedged(url: str, health: FeedHealth) -> tuple:
+    """Fetches a feed, sending one duplicate request if the first is slower than the feed's p95."""
+    attempts = [_request_executor.submit(_fetch_once, url)]
+    hedge_delay = health.hedge_delay()
+    if hedge_delay is not None:
+        done, _ = wait(attempts, timeout=hedge_delay, return_when=FIRST_COMPLETED)
+        if not done:
+            with health.lock:
+                health.hedges += 1
+            attempts.append(_request_executor.submit(_fetch_once, url))
+
+    # First successful attempt wins; the loser finishes in the background within its timeout
+    error = None
+    for attempt in as_completed(attempts):
+        try:
+            return attempt.result()
+        except Exception as e:
+            error = e
+    raise error
+
+def _scrape_feed(ticker: str, url: str) -> list:
+    health = _feed_health(url)
+    if health.is_open():
+        print(f"Circuit open for {ticker}; serving last good headlines.")
+        return health.fallback()
+
+    print(f"Scraping news for {ticker} from {url}")
+    start = time.monotonic()
+    try:
+        content, charset = _fetch_hedged(url, health)
+    except requests.exceptions.RequestException as e:
+        print(f"Could not fetch news for {ticker}: {e}")
+        health.record_failure()
+        return health.fallback()
+    except rate_limits.UpstreamSaturated as e:
+        # Our own limiter said no; that says nothing about the feed's health
+        print(f"Skipping news for {ticker}: {e}")
+        return health.fallback()
+
+    # Only items newer than the last successful fetch are parsed; the rest are reused
+    with health.lock:
+        previous_items = health.last_items
+    seen_keys = {rss_parser.item_key(item) for item in previous_items}
+    new_items = rss_parser.parse_items(content, seen_keys=seen_keys, header_charset=charset)
+    items = (new_items + previous_items)[:max(len(new_items), len(previous_items))]
+
+    headlines = [f"[{ticker}] {item['title']}" for item in items]
+    health.record_success(time.monotonic() - start, headlines, items)
+    return headlines
+
 
 def get_earnings_surprises(portfolio: dict) -> list:
     """
     Scrapes ALL recent RSS headlines for a portfolio of stocks.
     The keyword filter has been removed to ensure data is always available
     for the retriever agent.
+    Feeds are fetched concurrently and the stage always returns within
+    SCRAPE_DEADLINE_SECONDS; feeds that miss the deadline contribute their last good headlines.
     """
-    earnings_news = []
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-
     if not portfolio:
         return []
 
+    tasks = {}
     for ticker, details in portfolio.items():
         region = details.get('region', 'US')
         lang = details.get('lang', 'en-US')
-        
-        url = f"https://feeds.finance.yahoo.com/rss/2.0/headline?s={ticker}&region={region}&lang={lang}"
-        print(f"Scraping news for {ticker} from region: {region}")
+        url = f"{YAHOO_RSS_URL}?s={ticker}&region={region}&lang={lang}"
+        tasks[ticker] = (url, _feed_executor.submit(_scrape_feed, ticker, url))
 
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            feed = feedparser.parse(response.content)
-            
-            for entry in feed.entries:
-                title = entry.title
-                earnings_news.append(f"[{ticker}] {title}")
-                
-        except requests.exceptions.RequestException as e:
-            print(f"Could not fetch news for {ticker}: {e}")
-            continue
-            
-    return list(set(earnings_news))
\ No newline at end of file
+    wait([future for _, future in tasks.values()], timeout=SCRAPE_DEADLINE_SECONDS)
+
+    earnings_news = []
+    for ticker, (url, future) in tasks.items():
+        if future.done():
+            try:
+                earnings_news.extend(future.result())
+            except Exception as e:
+                # One broken feed must not abort the whole scrape
+                print(f"Scraping news for {ticker} failed unexpectedly: {e}; serving last good headlines.")
+                earnings_news.extend(_feed_health(url).fallback())
+        else:
+            print(f"News for {ticker} missed the {SCRAPE_DEADLINE_SECONDS}s scrape deadline; serving last good headlines.")
+            earnings_news.extend(_feed_health(url).fallback())
+
+    # Syndicated copies collapse into one document per story, in a stable order
+    return dedup_agent.collapse_near_duplicates(earnings_news)
@@ -5,6 +5,7 @@ import os
 from openai import OpenAI
 from dotenv import load_dotenv
 import io # Needed to handle bytes as a file
+from agents import rate_limits
 
 # Load environment variables (especially OPENAI_API_KEY)
 load_dotenv()
@@ -24,12 +25,13 @@ async def _speak_openai_tts_async(text: str, voice_model: str = "alloy"):
         return
     print("🤖 Speaking with OpenAI TTS (Streaming)...")
     try:
-        response = client.audio.speech.create(
-            model="tts-1",
-            voice=voice_model,
-            input=text,
-            response_format="mp3"
-        )
+        with rate_limits.limiter("openai_audio").acquire():
+            response = client.audio.speech.create(
+                model="tts-1",
+                voice=voice_model,
+                input=text,
+                response_format="mp3"
+            )
         ffplay_process = subprocess.Popen(
             ["ffplay", "-autoexit", "-nodisp", "-loglevel", "error", "-i", "pipe:0"],
             stdin=subprocess.PIPE,
@@ -70,10 +72,11 @@ def listen_and_transcribe(audio_bytes: bytes, audio_filename: str = "audio.wav")
         # Wrap the bytes in a file-like object
         audio_file_like_object = io.BytesIO(audio_bytes)
         # When sending bytes directly, you need to pass a tuple: (filename, file_like_object)
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=(audio_filename, audio_file_like_object)
-        )
+        with rate_limits.limiter("openai_audio").acquire():
+            transcript = client.audio.transcriptions.create(
+                model="whisper-1",
+                file=(audio_filename, audio_file_like_object)
+            )
         return transcript.text
     except Exception as e:
         return f"error: Could not request results from OpenAI Whisper API; {e}"
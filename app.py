@@ -5,6 +5,7 @@ import time
 import sys
 import os
 import requests
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from streamlit_mic_recorder import mic_recorder # <-- IMPORT THE NEW COMPONENT
 
 # --- This MUST be the first Streamlit command ---
@@ -65,7 +66,9 @@ def get_ai_brief(query: str):
     if not st.session_state.backend_ready:
         return {"error": "Backend server is not ready. Please wait."}
     try:
-        response = requests.post(API_URL, json={"query": query})
+        # The Streamlit session ID lets the backend reuse this chat's state on follow-up questions
+        ctx = get_script_run_ctx()
+        response = requests.post(API_URL, json={"query": query, "session_id": ctx.session_id if ctx else None})
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
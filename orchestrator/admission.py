@@ -0,0 +1,89 @@
+import os
+import time
+import math
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+# --- Configuration ---
+MAX_IN_FLIGHT = int(os.getenv("QUERY_MAX_IN_FLIGHT", "8"))
+MAX_QUEUE = int(os.getenv("QUERY_MAX_QUEUE", "32"))
+MAX_QUEUE_WAIT_SECONDS = float(os.getenv("QUERY_MAX_QUEUE_WAIT", "10"))
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; status_code is 429 (queue full) or 503 (waited too long)."""
+
+    def __init__(self, reason: str, status_code: int, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded queue in front of /query. At most max_in_flight requests run at once; up to
+    max_queue more wait (each for at most max_wait seconds) and anything beyond is shed
+    immediately instead of piling up behind a saturated backend.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, max_queue: int = MAX_QUEUE,
+                 max_wait: float = MAX_QUEUE_WAIT_SECONDS):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._in_flight = 0
+        self._queued = 0
+        self._waits_ms = deque(maxlen=500)
+        self._service_seconds = deque(maxlen=100)
+        self._counters = {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+
+    def _retry_after(self) -> int:
+        # Rough time for the queue ahead to drain
+        avg_service = sum(self._service_seconds) / len(self._service_seconds) if self._service_seconds else 1.0
+        return max(1, math.ceil(avg_service * (self._queued + 1) / self.max_in_flight))
+
+    @asynccontextmanager
+    async def admit(self):
+        if self._semaphore.locked() and self._queued >= self.max_queue:
+            self._counters["rejected_queue_full"] += 1
+            raise AdmissionRejected("Server is busy: request queue is full.", 429, self._retry_after())
+
+        start = time.monotonic()
+        self._queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self._counters["rejected_timeout"] += 1
+            raise AdmissionRejected("Server is busy: timed out waiting in the request queue.", 503, self._retry_after())
+        finally:
+            self._queued -= 1
+
+        self._waits_ms.append((time.monotonic() - start) * 1000)
+        self._counters["admitted"] += 1
+        self._in_flight += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_seconds.append(time.monotonic() - started)
+            self._in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits_ms)
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": self._queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "wait_ms_p50": round(waits[len(waits) // 2], 2) if waits else 0.0,
+            "wait_ms_p95": round(waits[int(len(waits) * 0.95)], 2) if waits else 0.0,
+            **self._counters,
+        }
+
+
+# Shared by every /query request handled in this process
+query_admission = AdmissionController()
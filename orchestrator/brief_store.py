@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agents import analysis_agent, llm_agent, context_builder
+from orchestrator.singleflight import coalescer, hash_key
+
+# --- Configuration ---
+# In multi-worker mode the writer process saves each new brief and analysis version here and workers serve them from disk
+BRIEF_SNAPSHOT_PATH = os.getenv("BRIEF_SNAPSHOT_PATH", os.path.join("index_store", "brief.json"))
+SERVER_ROLE = os.getenv("SERVER_ROLE", "standalone")
+# Also pre-generate a general market brief (one LLM call) whenever a new version is materialized;
+# workers never do, they serve the writer's snapshot
+BRIEF_PREGENERATE = os.getenv("BRIEF_PREGENERATE", "1") == "1" and SERVER_ROLE != "worker"
+BRIEF_QUERY = "Give me a short general market brief for my portfolio based on today's news."
+# A version whose brief failed (e.g. Gemini saturated or down) is retried no sooner than this
+BRIEF_RETRY_SECONDS = float(os.getenv("BRIEF_RETRY_SECONDS", "60"))
+
+
+class BriefStore:
+    """
+    Holds the query-independent part of a financial answer: the portfolio analysis and an
+    optional pre-generated market brief. A new version is materialized only when the portfolio,
+    the previous-day portfolio or the headline corpus changes; lookups are O(1) by that key.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = None
+        self._latest_brief = None
+        # One background worker for brief LLM calls, however many versions are materialized
+        self._brief_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="brief")
+        self._brief_future = None
+
+    def latest(self):
+        with self._lock:
+            return dict(self._current) if self._current else None
+
+    def latest_brief(self):
+        """The most recent pre-generated brief, even if a newer version is still generating its own."""
+        if SERVER_ROLE == "worker":
+            return self._load_snapshot().get("latest_brief")
+        with self._lock:
+            return dict(self._latest_brief) if self._latest_brief else None
+
+    def latest_analysis_version(self):
+        """The newest materialized analysis version; workers read the writer's, as they build none."""
+        if SERVER_ROLE == "worker":
+            return self._load_snapshot().get("analysis_version")
+        with self._lock:
+            return self._current["version"] if self._current else None
+
+    def _load_snapshot(self) -> dict:
+        try:
+            with open(BRIEF_SNAPSHOT_PATH, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_snapshot(self):
+        """Writes the latest brief and analysis version for the workers; called with the lock held."""
+        snapshot = {
+            "analysis_version": self._current["version"] if self._current else None,
+            "latest_brief": self._latest_brief,
+        }
+        os.makedirs(os.path.dirname(BRIEF_SNAPSHOT_PATH) or ".", exist_ok=True)
+        tmp_path = f"{BRIEF_SNAPSHOT_PATH}.tmp.{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, BRIEF_SNAPSHOT_PATH)
+
+    def materialize(self, portfolio: dict, previous_portfolio: dict, headlines: list, corpus_hash: str,
+                    generate_brief: bool = BRIEF_PREGENERATE, wait_for_brief: bool = False) -> dict:
+        """
+        Returns the version for these inputs, computing it only if the inputs changed. Also
+        starts generating the version's brief if it has none yet (e.g. an earlier attempt
+        failed) and no generation is in flight; wait_for_brief blocks until that is done.
+        """
+        key = hash_key([portfolio, previous_portfolio, corpus_hash])
+        with self._lock:
+            materialized = dict(self._current) if self._current and self._current["key"] == key else None
+        if materialized is None:
+            materialized = coalescer.do("materialize", key, self._build, key, portfolio, previous_portfolio, headlines)
+
+        if generate_brief:
+            waiting_since = time.time()
+            pending = self._schedule_brief(materialized["version"], portfolio, headlines)
+            while wait_for_brief and pending:
+                pending.result()
+                if self._failed_since(materialized["version"], waiting_since):
+                    break  # Retried on a later call, not in a loop here
+                # The generation we waited for may have been for an older version
+                pending = self._schedule_brief(materialized["version"], portfolio, headlines)
+            if wait_for_brief:
+                with self._lock:
+                    if self._current and self._current["version"] == materialized["version"]:
+                        materialized = dict(self._current)
+        return materialized
+
+    def _build(self, key, portfolio, previous_portfolio, headlines) -> dict:
+        analysis_summary = analysis_agent.analyze_portfolio_risk(portfolio, previous_portfolio, headlines)
+        with self._lock:
+            version = (self._current["version"] + 1) if self._current else 1
+            self._current = {
+                "version": version,
+                "key": key,
+                "created_at": time.time(),
+                "analysis_summary": analysis_summary,
+                "brief": None,
+                "brief_created_at": None,
+                "brief_failed_at": None,
+            }
+            materialized = dict(self._current)
+            self._save_snapshot()
+        print(f"Materialized portfolio analysis version {version}.")
+        return materialized
+
+    def _failed_since(self, version, since: float) -> bool:
+        with self._lock:
+            current = self._current
+            return bool(current and current["version"] == version and (current["brief_failed_at"] or 0) >= since)
+
+    def _schedule_brief(self, version, portfolio, headlines):
+        """
+        Queues the brief for `version` on the single brief worker unless the version already has
+        one, a generation is in flight, or it failed less than BRIEF_RETRY_SECONDS ago.
+        Returns the future to wait on (the in-flight one, if any), or None.
+        """
+        with self._lock:
+            if self._brief_future and not self._brief_future.done():
+                return self._brief_future
+            current = self._current
+            if not current or current["version"] != version or current["brief"] is not None:
+                return None
+            if current["brief_failed_at"] and time.time() - current["brief_failed_at"] < BRIEF_RETRY_SECONDS:
+                return None
+            self._brief_future = self._brief_executor.submit(
+                self._generate_brief, version, portfolio, current["analysis_summary"], headlines)
+            return self._brief_future
+
+    def _generate_brief(self, version, portfolio, analysis_summary, headlines):
+        brief_state = {
+            "user_query": BRIEF_QUERY,
+            "portfolio_data": portfolio,
+            "analysis_summary": analysis_summary,
+            # No query to rank by: equal scores let allocation weight decide what fits the budget
+            "retrieved_news": headlines,
+            "retrieval_scores": [1.0] * len(headlines),
+        }
+        summary_context = context_builder.build_summary_context(brief_state)
+        summary_context.pop("prompt_stats")
+        try:
+            brief = llm_agent.generate_summary(summary_context)
+        except Exception as e:
+            # Left without a brief; the next materialize() for this version retries after BRIEF_RETRY_SECONDS
+            print(f"Could not pre-generate market brief for version {version}: {e}")
+            with self._lock:
+                if self._current and self._current["version"] == version:
+                    self._current["brief_failed_at"] = time.time()
+            return
+        created_at = time.time()
+        with self._lock:
+            # A newer version may have been materialized meanwhile; never attach a stale brief to it
+            if self._current and self._current["version"] == version:
+                self._current["brief"] = brief
+                self._current["brief_created_at"] = created_at
+            if not self._latest_brief or self._latest_brief["version"] < version:
+                self._latest_brief = {"version": version, "brief": brief, "created_at": created_at}
+                self._save_snapshot()
+        print(f"Pre-generated market brief for version {version}.")
+
+
+# Shared by the graph, the scheduler and the /brief endpoint
+brief_store = BriefStore()
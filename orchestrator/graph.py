@@ -1,15 +1,18 @@
 import os
 import json
 import sys
+import time
 from typing import TypedDict, List, Optional
 
 # --- Add project root to the Python path ---
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # --- Import agents and LangGraph components ---
-from agents import retriever_agent, analysis_agent, llm_agent, scraper_agent
+from agents import retriever_agent, llm_agent, scraper_agent, rate_limits, context_builder
+from orchestrator.singleflight import coalescer, hash_key, normalize_query
+from orchestrator.brief_store import brief_store
+from orchestrator.sessions import checkpointer, STAGE_FRESHNESS_SECONDS
 from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
 
 
@@ -25,9 +28,14 @@ class GraphState(TypedDict):
     portfolio_data: dict
     previous_portfolio_data: Optional[dict]
     scraped_headlines: List[str]
+    scraped_at: float
+    corpus_hash: str
+    index_version: str
     retrieved_news: List[str]
     retrieval_scores: List[float]
     analysis_summary: dict
+    analysis_corpus_hash: str
+    prompt_stats: dict
     final_response: str
 
 # --- Node Functions ---
@@ -41,7 +49,7 @@ def classify_intent(state: GraphState):
     user_query = state["user_query"]
     
     # We use a simple, fast LLM call to classify the intent
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+    llm = llm_agent.get_llm()
     prompt = ChatPromptTemplate.from_template(
         """Your task is to classify the user's query into one of two categories: 'financial_query' or 'general_conversation'.
         - 'financial_query': For questions about stocks, markets, portfolios, earnings, financial news, or specific companies.
@@ -52,7 +60,13 @@ def classify_intent(state: GraphState):
         Return only the category name as a single string."""
     )
     chain = prompt | llm
-    intent = chain.invoke({"query": user_query}).content.strip()
+
+    def classify():
+        with rate_limits.limiter("gemini").acquire():
+            return chain.invoke({"query": user_query}).content.strip()
+
+    # Concurrent identical questions share one classification call
+    intent = coalescer.do("classify_intent", normalize_query(user_query), classify)
     
     print(f"Intent classified as: {intent}")
     return {"intent_type": intent}
@@ -63,23 +77,25 @@ def handle_general_conversation(state: GraphState):
     print("---Entering Node: handle_general_conversation (General Path)---")
     user_query = state["user_query"]
     
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+    llm = llm_agent.get_llm()
     prompt = ChatPromptTemplate.from_template(
         """You are a helpful and friendly AI financial assistant. Answer the user's general question directly and conversationally.
         
         User's question: "{query}" """
     )
     chain = prompt | llm
-    response = chain.invoke({"query": user_query}).content
+
+    def answer():
+        with rate_limits.limiter("gemini").acquire():
+            return chain.invoke({"query": user_query}).content
+
+    response = coalescer.do("general_conversation", normalize_query(user_query), answer)
     
     return {"final_response": response}
 
 # --- Nodes from our previous financial workflow ---
 
-def load_data_and_scrape(state: GraphState):
-    """Node 2b: Loads portfolio and scrapes news (Financial Path)"""
-    print("---Entering Node: load_data_and_scrape (Financial Path)---")
-    # (This function's internal code is unchanged)
+def _load_portfolios():
     with open(PORTFOLIO_CONFIG_PATH, 'r') as f:
         portfolio_data = json.load(f).get("portfolio", {})
     try:
@@ -87,8 +103,36 @@ def load_data_and_scrape(state: GraphState):
             previous_portfolio_data = json.load(f).get("portfolio", {})
     except FileNotFoundError:
         previous_portfolio_data = {}
-    scraped_headlines = scraper_agent.get_earnings_surprises(portfolio=portfolio_data)
-    return {"portfolio_data": portfolio_data, "previous_portfolio_data": previous_portfolio_data, "scraped_headlines": scraped_headlines}
+    return portfolio_data, previous_portfolio_data
+
+def _scrape(portfolio_data: dict) -> list:
+    if retriever_agent.READ_ONLY:
+        # Multi-worker mode: the writer process scrapes and publishes; workers answer from its corpus
+        return retriever_agent.published_documents()
+    # Concurrent requests for the same ticker set wait for one scrape instead of repeating it
+    scrape_key = hash_key(sorted((ticker, details.get('region'), details.get('lang')) for ticker, details in portfolio_data.items()))
+    return coalescer.do("scrape", scrape_key, scraper_agent.get_earnings_surprises, portfolio=portfolio_data)
+
+def load_data_and_scrape(state: GraphState):
+    """Node 2b: Loads portfolio and scrapes news (Financial Path)"""
+    print("---Entering Node: load_data_and_scrape (Financial Path)---")
+    portfolio_data, previous_portfolio_data = _load_portfolios()
+
+    # Session follow-ups: keep this session's headlines while they are fresh and the portfolio is unchanged
+    scraped_at = state.get("scraped_at") or 0
+    if (state.get("scraped_headlines") and state.get("portfolio_data") == portfolio_data
+            and time.time() - scraped_at < STAGE_FRESHNESS_SECONDS):
+        print(f"Reusing session headlines scraped {time.time() - scraped_at:.0f}s ago.")
+        return {}
+
+    scraped_headlines = _scrape(portfolio_data)
+    return {
+        "portfolio_data": portfolio_data,
+        "previous_portfolio_data": previous_portfolio_data,
+        "scraped_headlines": scraped_headlines,
+        "scraped_at": time.time(),
+        "corpus_hash": retriever_agent.corpus_hash(scraped_headlines),
+    }
 
 def retrieve_relevant_news(state: GraphState):
     """Node 2: Retrieves news and now prints debug information."""
@@ -105,8 +149,13 @@ def retrieve_relevant_news(state: GraphState):
     if not scraped_headlines:
         return {"retrieved_news": [], "retrieval_scores": []}
 
-    retriever_agent.create_and_store_embeddings(scraped_headlines)
-    retrieval_results = retriever_agent.retrieve_top_k(user_query, k=5)
+    # Session follow-ups search the index version bound to the session's headlines
+    index_version = state.get("index_version")
+    if not retriever_agent.has_version(index_version, state["corpus_hash"]):
+        # Keyed by the headline set: duplicates wait for one build, and an already stored version is reused
+        index_version = coalescer.do("index", state["corpus_hash"], retriever_agent.ensure_index, scraped_headlines)
+    # Search exactly the version for this request's headlines, whatever has been published since
+    retrieval_results = retriever_agent.retrieve_top_k(user_query, k=5, version=index_version)
 
     # ADDED FOR DEBUGGING
     print(f"Retrieved {len(retrieval_results['documents'])} documents.")
@@ -117,20 +166,36 @@ def retrieve_relevant_news(state: GraphState):
 
     return {
         "retrieved_news": retrieval_results["documents"],
-        "retrieval_scores": retrieval_results["scores"]
+        "retrieval_scores": retrieval_results["scores"],
+        "index_version": index_version,
     }
 
 def run_analysis(state: GraphState):
     print("---Entering Node: run_analysis---")
-    # (This function's internal code is unchanged)
-    analysis_summary = analysis_agent.analyze_portfolio_risk(state["portfolio_data"], state["previous_portfolio_data"], state["scraped_headlines"])
-    return {"analysis_summary": analysis_summary}
+    # Session follow-ups already hold the analysis for their (unchanged) corpus
+    if state.get("analysis_summary") and state.get("analysis_corpus_hash") == state["corpus_hash"]:
+        return {}
+    # The analysis does not depend on the question: reuse the materialized version for this
+    # portfolio and corpus, computing (and versioning) it only when one of them changed
+    materialized = brief_store.materialize(
+        state["portfolio_data"], state["previous_portfolio_data"], state["scraped_headlines"], state["corpus_hash"]
+    )
+    return {"analysis_summary": materialized["analysis_summary"], "analysis_corpus_hash": state["corpus_hash"]}
 
 def generate_final_response(state: GraphState):
     print("---Entering Node: generate_final_response---")
-    # (This function's internal code is unchanged)
-    final_summary = llm_agent.generate_summary(state)
-    return {"final_response": final_summary}
+    # Compact, token-budgeted context instead of the raw state reprs
+    summary_context = context_builder.build_summary_context(state)
+    prompt_stats = summary_context.pop("prompt_stats")
+    print(f"Summary context: {prompt_stats['context_tokens_before']} -> {prompt_stats['context_tokens_after']} tokens (~), {prompt_stats['lines_dropped']} lines dropped.")
+
+    # Same question over the same context: concurrent duplicates share one LLM call
+    context_key = hash_key([normalize_query(state["user_query"]), summary_context])
+    try:
+        final_summary = coalescer.do("generate_summary", context_key, llm_agent.generate_summary, summary_context)
+    except llm_agent.LLMError as e:
+        final_summary = str(e)
+    return {"final_response": final_summary, "prompt_stats": prompt_stats}
 
 def generate_clarification_response(state: GraphState):
     print("---Entering Node: generate_clarification_response---")
@@ -140,12 +205,29 @@ def generate_clarification_response(state: GraphState):
 
 def save_daily_log(state: GraphState):
     print("---Entering Node: save_daily_log---")
-    # (This function's internal code is unchanged)
-    with open(DAILY_LOG_PATH, 'w') as f: json.dump({"portfolio": state["portfolio_data"]}, f, indent=2)
+    # Several worker processes may save at once: write a temporary file and swap it in
+    tmp_path = f"{DAILY_LOG_PATH}.tmp.{os.getpid()}"
+    with open(tmp_path, 'w') as f: json.dump({"portfolio": state["portfolio_data"]}, f, indent=2)
+    os.replace(tmp_path, DAILY_LOG_PATH)
     return {}
 
 
 
+def refresh_materialized_brief():
+    """Scheduled refresh: scrapes the portfolio's news and materializes analysis + brief if anything changed."""
+    portfolio_data, previous_portfolio_data = _load_portfolios()
+    scraped_headlines = _scrape(portfolio_data)
+    # Build and publish the index ahead of the next query (and for worker processes in multi-worker mode)
+    if scraped_headlines:
+        index_version = coalescer.do("index", retriever_agent.corpus_hash(scraped_headlines), retriever_agent.ensure_index, scraped_headlines)
+        if index_version and not retriever_agent.READ_ONLY:
+            retriever_agent.publish_version(index_version)
+    return brief_store.materialize(
+        portfolio_data, previous_portfolio_data, scraped_headlines,
+        retriever_agent.corpus_hash(scraped_headlines), wait_for_brief=True
+    )
+
+
 def route_based_on_intent(state: GraphState):
     """New primary router. Decides between the financial path and general chat."""
     print("---Routing based on intent...---")
@@ -209,4 +291,6 @@ workflow.add_edge("save_log", END)
 workflow.add_edge("clarify_question", END)
 workflow.add_edge("handle_general_conversation", END)
 
-app = workflow.compile()
\ No newline at end of file
+app = workflow.compile()
+# Same graph with per-session state persisted between turns (thread_id = session ID)
+session_app = workflow.compile(checkpointer=checkpointer)
\ No newline at end of file
@@ -1,19 +1,83 @@
-from fastapi import FastAPI
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
 
 # Import the compiled LangGraph app from our new graph.py file
-from .graph import app as financial_assistant_graph
+from .graph import app as financial_assistant_graph, session_app as session_graph, refresh_materialized_brief, GraphState
+from .sessions import session_manager, SESSION_SWEEP_SECONDS
+from .brief_store import brief_store
+from .singleflight import coalescer
+from .admission import query_admission, AdmissionRejected
+from agents import rate_limits, scraper_agent, dedup_agent
+
+# "gzip" (default), "br" (needs the brotli-asgi package; falls back to gzip) or "none".
+# Only bodies above COMPRESSION_MIN_BYTES are compressed, which in practice means verbose responses.
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "gzip")
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+# Parts of the graph state a client may ask for with `fields`
+CONTEXT_FIELDS = set(GraphState.__annotations__)
+
+# How often the background task re-scrapes and re-materializes the portfolio brief (0 disables it)
+BRIEF_REFRESH_SECONDS = float(os.getenv("BRIEF_REFRESH_SECONDS", "900"))
+
+async def _refresh_brief_periodically():
+    while True:
+        try:
+            await run_in_threadpool(refresh_materialized_brief)
+        except Exception as e:
+            print(f"Scheduled brief refresh failed: {e}")
+        await asyncio.sleep(BRIEF_REFRESH_SECONDS)
+
+async def _sweep_sessions_periodically():
+    # Also runs right at startup, so sessions idle since before a restart are evicted too
+    while True:
+        try:
+            await run_in_threadpool(session_manager.evict_expired)
+        except Exception as e:
+            print(f"Session sweep failed: {e}")
+        await asyncio.sleep(SESSION_SWEEP_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    refresher = asyncio.create_task(_refresh_brief_periodically()) if BRIEF_REFRESH_SECONDS > 0 else None
+    sweeper = asyncio.create_task(_sweep_sessions_periodically()) if SESSION_SWEEP_SECONDS > 0 else None
+    yield
+    for task in (refresher, sweeper):
+        if task:
+            task.cancel()
 
 
 app = FastAPI(
     title="LangGraph Financial Assistant API",
     description="An API powered by LangGraph to orchestrate a multi-agent workflow.",
-    version="3.0.0"
+    version="3.0.0",
+    lifespan=lifespan
 )
 
+if RESPONSE_COMPRESSION == "br":
+    try:
+        from brotli_asgi import BrotliMiddleware
+        app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_BYTES)  # Falls back to gzip for clients without br
+    except ImportError:
+        print("brotli-asgi is not installed; compressing responses with gzip instead.")
+        app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
+elif RESPONSE_COMPRESSION == "gzip":
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
+
 # API Models
 class QueryRequest(BaseModel):
     query: str
+    # By default only the answer is returned. `fields` selects parts of the graph state
+    # (e.g. ["retrieved_news", "retrieval_scores"]); `verbose` returns all of it.
+    fields: Optional[List[str]] = None
+    verbose: bool = False
+    # Follow-ups in the same session reuse its fresh headlines, index and analysis
+    session_id: Optional[str] = None
 
 # API Endpoints
 @app.post("/query", summary="Get a dynamic market brief using the agent graph")
@@ -24,21 +88,57 @@ async def get_market_brief(request: QueryRequest):
     """
     user_query = request.query
     print(f"Received query, invoking agent graph: {user_query}")
+
+    unknown_fields = set(request.fields or []) - CONTEXT_FIELDS
+    if unknown_fields:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {sorted(unknown_fields)}. Available: {sorted(CONTEXT_FIELDS)}")
     
     # The input to the graph must be a dictionary with keys matching the GraphState
     inputs = {"user_query": user_query}
     
     # Invoke the graph and stream the results
-    # .invoke() runs the graph to completion
-    final_state = financial_assistant_graph.invoke(inputs)
+    # .invoke() runs the graph to completion; it runs in the threadpool so that
+    # concurrent requests proceed in parallel (and can share coalesced work)
+    # Requests beyond the bounded queue (or waiting too long in it) are shed with Retry-After
+    try:
+        async with query_admission.admit():
+            if request.session_id:
+                config = session_manager.touch(request.session_id)
+                final_state = await run_in_threadpool(session_graph.invoke, inputs, config)
+            else:
+                final_state = await run_in_threadpool(financial_assistant_graph.invoke, inputs)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+    except rate_limits.UpstreamSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
     # The final response is in the 'final_response' key of the state
     response_text = final_state.get("final_response", "Error: No final response was generated.")
     
     print("--- Graph Execution Complete ---")
     
-    # We return the final response and the full state for debugging/context
-    return {"response": response_text, "context_used": final_state}
+    # Only the answer by default; the (large) graph state only when asked for
+    if request.verbose:
+        return {"response": response_text, "context_used": final_state}
+    if request.fields:
+        return {"response": response_text, "context_used": {field: final_state.get(field) for field in request.fields}}
+    return {"response": response_text}
+
+@app.get("/brief", summary="Latest pre-generated market brief (no LLM call)")
+def read_brief():
+    latest_brief = brief_store.latest_brief()
+    if not latest_brief:
+        raise HTTPException(status_code=404, detail="No market brief has been generated yet.")
+    return {
+        "brief": latest_brief["brief"],
+        "version": latest_brief["version"],
+        "generated_at": latest_brief["created_at"],
+        "latest_analysis_version": brief_store.latest_analysis_version(),
+    }
+
+@app.get("/stats", summary="Coalescing counters, queue depth/wait, limiter usage and per-feed health")
+def read_stats():
+    return {"singleflight": coalescer.stats(), "admission": query_admission.stats(), "upstreams": rate_limits.stats(), "feeds": scraper_agent.feed_stats(), "dedup": dedup_agent.stats(), "sessions": session_manager.stats()}
 
 @app.get("/", summary="Root endpoint for health check")
 def read_root():
@@ -0,0 +1,80 @@
+"""
+Multi-worker server mode.
+
+One writer process owns the headline corpus and the FAISS index: it scrapes on a schedule,
+builds and publishes new index versions and pre-generates the market brief. N uvicorn worker
+processes serve the API; they open the published index read-only through memory mapping and
+switch to a new version as soon as the writer publishes it.
+
+Run from the project root:
+    uv run python -m orchestrator.server --workers 4
+"""
+import os
+import sys
+import time
+import argparse
+import importlib.util
+import multiprocessing
+
+# --- Add project root to the Python path ---
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_writer(refresh_seconds: float):
+    """
+    Writer process: the only process that scrapes and publishes index versions. A refresh
+    interval <= 0 (as in BRIEF_REFRESH_SECONDS=0, "disabled") refreshes once at startup only.
+    """
+    from orchestrator.graph import refresh_materialized_brief
+
+    while True:
+        try:
+            materialized = refresh_materialized_brief()
+            print(f"Writer: analysis version {materialized['version']} is current.")
+        except Exception as e:
+            print(f"Writer: refresh failed: {e}")
+        if refresh_seconds <= 0:
+            print("Writer: scheduled refreshes are disabled; keeping the startup index.")
+            return
+        time.sleep(refresh_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with one writer and several read-only workers.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--refresh-seconds", type=float, default=float(os.getenv("BRIEF_REFRESH_SECONDS", "900")),
+                        help="Writer re-scrape interval; <= 0 refreshes once at startup only")
+    args = parser.parse_args()
+
+    # Each worker loads its own embedding model; the int8 ONNX model keeps that per-worker cost small.
+    # Writer and workers must agree on the backend, so it is fixed here before any process starts,
+    # and the model is exported here once: a writer that cannot export it would fail every refresh.
+    if "EMBEDDING_BACKEND" not in os.environ and importlib.util.find_spec("onnxruntime") and importlib.util.find_spec("onnx"):
+        from agents import embedding_backend
+        try:
+            embedding_backend.export_onnx_model(quantize=True)
+            os.environ["EMBEDDING_BACKEND"] = "onnx-int8"
+        except Exception as e:
+            print(f"Could not export the int8 ONNX model, serving with the torch backend: {e}")
+    print(f"Embedding backend: {os.environ.get('EMBEDDING_BACKEND', 'torch')}")
+
+    # Child processes inherit the environment at the moment they are started
+    os.environ["SERVER_ROLE"] = "writer"
+    writer = multiprocessing.get_context("spawn").Process(target=run_writer, args=(args.refresh_seconds,), name="index-writer", daemon=True)
+    writer.start()
+
+    os.environ["SERVER_ROLE"] = "worker"
+    os.environ["BRIEF_REFRESH_SECONDS"] = "0"  # The writer owns scheduled refreshes
+
+    import uvicorn
+    try:
+        uvicorn.run("orchestrator.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        writer.terminate()
+        writer.join()
+
+
+if __name__ == '__main__':
+    main()
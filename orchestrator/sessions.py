@@ -0,0 +1,95 @@
+import os
+import time
+import threading
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+# --- Configuration ---
+# "memory" keeps sessions in this process; "sqlite" persists them (needs langgraph-checkpoint-sqlite)
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "sessions.sqlite")
+# Sessions idle for longer than this are evicted from the checkpointer
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+# How often the API process sweeps the checkpointer for idle sessions
+SESSION_SWEEP_SECONDS = float(os.getenv("SESSION_SWEEP_SECONDS", "60"))
+# Follow-up questions reuse a session's scraped headlines (and the index/analysis built from them) while younger than this
+STAGE_FRESHNESS_SECONDS = float(os.getenv("SESSION_STAGE_FRESHNESS_SECONDS", "300"))
+
+
+def create_checkpointer():
+    if SESSION_STORE == "sqlite":
+        try:
+            import sqlite3
+            from langgraph.checkpoint.sqlite import SqliteSaver
+            return SqliteSaver(sqlite3.connect(SESSION_SQLITE_PATH, check_same_thread=False))
+        except ImportError:
+            print("langgraph-checkpoint-sqlite is not installed; keeping sessions in memory instead.")
+    return InMemorySaver()
+
+
+class SessionManager:
+    """
+    Maps session IDs to LangGraph threads and evicts threads that have been idle past the TTL.
+    Last-seen times live in a small side table updated by touch(), so a sweep reads one row per
+    session instead of every checkpoint. With a path the table is a sqlite file next to the
+    persisted checkpoints (SESSION_STORE=sqlite) and survives restarts; without one it is a dict.
+    """
+
+    def __init__(self, checkpointer, ttl_seconds: float = SESSION_TTL_SECONDS, last_seen_path: str = None):
+        self.checkpointer = checkpointer
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._last_seen = {}
+        self._db = None
+        if last_seen_path:
+            import sqlite3
+            self._db = sqlite3.connect(last_seen_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS session_last_seen (thread_id TEXT PRIMARY KEY, last_seen REAL NOT NULL)")
+            self._db.commit()
+        self._evicted = 0
+
+    def touch(self, session_id: str) -> dict:
+        """Records the session as active now and returns the graph config for its thread."""
+        now = time.time()
+        with self._lock:
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO session_last_seen VALUES (?, ?)", (session_id, now))
+                self._db.commit()
+            else:
+                self._last_seen[session_id] = now
+        return {"configurable": {"thread_id": session_id}}
+
+    def _expire(self, cutoff: float) -> list:
+        """Removes and returns the threads last seen before the cutoff."""
+        with self._lock:
+            if self._db is not None:
+                expired = [row[0] for row in self._db.execute("SELECT thread_id FROM session_last_seen WHERE last_seen < ?", (cutoff,))]
+                self._db.execute("DELETE FROM session_last_seen WHERE last_seen < ?", (cutoff,))
+                self._db.commit()
+            else:
+                expired = [thread_id for thread_id, seen in self._last_seen.items() if seen < cutoff]
+                for thread_id in expired:
+                    del self._last_seen[thread_id]
+        return expired
+
+    def evict_expired(self):
+        """Deletes every thread idle for longer than the TTL; run on a timer by the API process."""
+        expired = self._expire(time.time() - self.ttl_seconds)
+        for thread_id in expired:
+            self.checkpointer.delete_thread(thread_id)
+        with self._lock:
+            self._evicted += len(expired)
+        if expired:
+            print(f"Evicted {len(expired)} idle session(s).")
+
+    def stats(self) -> dict:
+        with self._lock:
+            active = (self._db.execute("SELECT COUNT(*) FROM session_last_seen").fetchone()[0]
+                      if self._db is not None else len(self._last_seen))
+            return {"active": active, "evicted": self._evicted, "ttl_seconds": self.ttl_seconds}
+
+
+checkpointer = create_checkpointer()
+# The side table only persists when the checkpoints do; a memory fallback keeps it in memory too
+_persistent = SESSION_STORE == "sqlite" and not isinstance(checkpointer, InMemorySaver)
+session_manager = SessionManager(checkpointer, last_seen_path=SESSION_SQLITE_PATH if _persistent else None)
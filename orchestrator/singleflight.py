@@ -0,0 +1,74 @@
+import json
+import hashlib
+import threading
+from collections import defaultdict
+
+
+def hash_key(value) -> str:
+    """Stable short hash of any JSON-serializable value, used to key coalesced work."""
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a user query."""
+    return " ".join(query.lower().split())
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work. The first caller for a (kind, key) pair runs
+    the function; callers arriving while it is in progress wait for and share its result
+    (or its exception) instead of repeating the work. Nothing is cached once it finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = defaultdict(lambda: {"executed": 0, "coalesced": 0})
+
+    def do(self, kind: str, key: str, fn, *args, **kwargs):
+        call_key = (kind, key)
+        with self._lock:
+            call = self._calls.get(call_key)
+            leader = call is None
+            if leader:
+                call = self._calls[call_key] = _Call()
+                self._counters[kind]["executed"] += 1
+            else:
+                self._counters[kind]["coalesced"] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[call_key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {kind: dict(counts) for kind, counts in self._counters.items()}
+            in_flight = len(self._calls)
+        for counts in stats.values():
+            total = counts["executed"] + counts["coalesced"]
+            counts["coalesced_ratio"] = round(counts["coalesced"] / total, 3) if total else 0.0
+        return {"in_flight": in_flight, "by_kind": stats}
+
+
+# Shared by every request handled in this process
+coalescer = SingleFlight()
@@ -1,5 +1,6 @@
 import streamlit as st
 import requests
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import sys
 import os
 import time
@@ -79,7 +80,9 @@ st.markdown("""
 # --- Helper Function to call backend ---
 def get_ai_brief(query: str):
     try:
-        response = requests.post(API_URL, json={"query": query})
+        # The Streamlit session ID lets the backend reuse this chat's state on follow-up questions
+        ctx = get_script_run_ctx()
+        response = requests.post(API_URL, json={"query": query, "session_id": ctx.session_id if ctx else None})
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -0,0 +1,96 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from agents.rate_limits import UpstreamLimiter, UpstreamSaturated
+from orchestrator.admission import AdmissionController, AdmissionRejected
+
+
+async def _occupy(controller: AdmissionController, release: asyncio.Event):
+    async with controller.admit():
+        await release.wait()
+
+
+def test_full_queue_is_rejected_with_429():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, max_wait=5)
+        release = asyncio.Event()
+        running = asyncio.create_task(_occupy(controller, release))
+        queued = asyncio.create_task(_occupy(controller, release))
+        await asyncio.sleep(0.01)
+        assert controller.stats()["in_flight"] == 1 and controller.stats()["queue_depth"] == 1
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit():
+                pass
+        release.set()
+        await asyncio.gather(running, queued)
+        return controller, rejected.value
+
+    controller, rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.retry_after >= 1
+    assert controller.stats()["rejected_queue_full"] == 1
+    assert controller.stats()["admitted"] == 2
+
+
+def test_queue_wait_timeout_is_rejected_with_503():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=4, max_wait=0.05)
+        release = asyncio.Event()
+        running = asyncio.create_task(_occupy(controller, release))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit():
+                pass
+        release.set()
+        await running
+        return controller, rejected.value
+
+    controller, rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert rejected.retry_after >= 1
+    assert controller.stats()["rejected_timeout"] == 1
+    assert controller.stats()["queue_depth"] == 0
+
+
+def test_upstream_concurrency_cap_raises_saturated():
+    upstream = UpstreamLimiter("fake", concurrency=1, acquire_timeout=0.05)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold():
+        with upstream.acquire():
+            holding.set()
+            release.wait()
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    holding.wait()
+    with pytest.raises(UpstreamSaturated) as saturated:
+        with upstream.acquire():
+            pass
+    release.set()
+    worker.join()
+
+    assert saturated.value.upstream == "fake"
+    assert saturated.value.retry_after == 1
+    assert upstream.stats()["rejected"] == 1
+    with upstream.acquire():  # The slot is free again
+        assert upstream.stats()["active"] == 1
+
+
+def test_upstream_rate_limit_raises_saturated():
+    upstream = UpstreamLimiter("fake", concurrency=1, rate=1, acquire_timeout=0.05)
+    with upstream.acquire():
+        pass
+    # The bucket is empty and the next token arrives in ~1s, after the acquire deadline
+    start = time.monotonic()
+    with pytest.raises(UpstreamSaturated):
+        with upstream.acquire():
+            pass
+    assert time.monotonic() - start < 0.5
+    assert upstream.stats()["admitted"] == 1
+    assert upstream.stats()["rejected"] == 1
@@ -0,0 +1,88 @@
+import threading
+
+from agents import llm_agent
+from orchestrator import brief_store as brief_store_module
+from orchestrator.brief_store import BriefStore
+
+PORTFOLIO = {"TSM": {"name": "TSMC", "allocation": 0.6}, "AAPL": {"name": "Apple", "allocation": 0.4}}
+HEADLINES = ["[TSM] TSMC forecasts strong Q3 revenue on AI chip demand", "[AAPL] Apple shares rise after iPhone sales"]
+
+
+def _materialize(store: BriefStore, **kwargs) -> dict:
+    return store.materialize(PORTFOLIO, PORTFOLIO, HEADLINES, "corpus-1", generate_brief=True, **kwargs)
+
+
+def test_failed_brief_is_retried_for_the_same_version(monkeypatch, tmp_path):
+    monkeypatch.setattr(brief_store_module, "BRIEF_SNAPSHOT_PATH", str(tmp_path / "brief.json"))
+    monkeypatch.setattr(brief_store_module, "BRIEF_RETRY_SECONDS", 0)
+    outcomes = [llm_agent.LLMError("Gemini is down"), "Markets are calm."]
+
+    def generate_summary(context):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(llm_agent, "generate_summary", generate_summary)
+    store = BriefStore()
+
+    first = _materialize(store, wait_for_brief=True)
+    assert first["brief"] is None and first["brief_failed_at"]
+    assert store.latest_brief() is None
+
+    second = _materialize(store, wait_for_brief=True)
+    assert second["version"] == first["version"]
+    assert second["brief"] == "Markets are calm."
+    assert store.latest_brief()["brief"] == "Markets are calm."
+
+
+def test_failed_brief_waits_for_the_retry_interval(monkeypatch, tmp_path):
+    monkeypatch.setattr(brief_store_module, "BRIEF_SNAPSHOT_PATH", str(tmp_path / "brief.json"))
+    monkeypatch.setattr(brief_store_module, "BRIEF_RETRY_SECONDS", 3600)
+    calls = []
+
+    def generate_summary(context):
+        calls.append(context)
+        raise llm_agent.LLMError("Gemini is down")
+
+    monkeypatch.setattr(llm_agent, "generate_summary", generate_summary)
+    store = BriefStore()
+    _materialize(store, wait_for_brief=True)
+    _materialize(store, wait_for_brief=True)
+    assert len(calls) == 1
+
+
+def test_only_one_brief_generation_runs_at_a_time(monkeypatch, tmp_path):
+    monkeypatch.setattr(brief_store_module, "BRIEF_SNAPSHOT_PATH", str(tmp_path / "brief.json"))
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def generate_summary(context):
+        calls.append(context)
+        started.set()
+        release.wait()
+        return "Markets are calm."
+
+    monkeypatch.setattr(llm_agent, "generate_summary", generate_summary)
+    store = BriefStore()
+    _materialize(store)
+    started.wait()
+    for _ in range(5):
+        assert _materialize(store)["brief"] is None
+    release.set()
+
+    assert _materialize(store, wait_for_brief=True)["brief"] == "Markets are calm."
+    assert len(calls) == 1
+
+
+def test_workers_report_the_writer_analysis_version(monkeypatch, tmp_path):
+    monkeypatch.setattr(brief_store_module, "BRIEF_SNAPSHOT_PATH", str(tmp_path / "brief.json"))
+    monkeypatch.setattr(llm_agent, "generate_summary", lambda context: "Markets are calm.")
+    writer = BriefStore()
+    _materialize(writer, wait_for_brief=True)
+    writer.materialize(PORTFOLIO, PORTFOLIO, HEADLINES, "corpus-2", generate_brief=False)
+
+    monkeypatch.setattr(brief_store_module, "SERVER_ROLE", "worker")
+    worker = BriefStore()
+    assert worker.latest_brief()["version"] == 1
+    assert worker.latest_analysis_version() == 2
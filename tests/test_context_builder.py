@@ -0,0 +1,38 @@
+import pytest
+
+from agents import context_builder
+
+STATE = {
+    "user_query": "How is TSMC doing?",
+    "portfolio_data": {
+        "2330.TW": {"name": "TSMC", "allocation": 0.4},
+        "005930.KS": {"name": "Samsung Electronics", "allocation": 0.3},
+        "TCEHY": {"allocation": 0.3},
+    },
+    "analysis_summary": {
+        "portfolio_sentiment_analysis": ["2330.TW: Positive news", "2330.TW: Negative news", "TCEHY: Positive news"],
+        "portfolio_change_analysis": ["TSM allocation changed by +2.0% points"],
+    },
+    "retrieved_news": [f"[2330.TW] TSMC headline number {i} about AI chips and revenue" for i in range(8)],
+    "retrieval_scores": [0.5 + i / 10 for i in range(8)],
+}
+
+# Headers and "- None" placeholders are always rendered, so no budget can go below their cost
+FIXED_COST = context_builder.build_summary_context({"user_query": ""}, token_budget=0)["prompt_stats"]["context_tokens_after"]
+
+
+@pytest.mark.parametrize("budget", [FIXED_COST, FIXED_COST + 1, 40, 60, 100, 150, 250])
+def test_rendered_context_never_exceeds_the_budget(budget):
+    stats = context_builder.build_summary_context(STATE, token_budget=budget)["prompt_stats"]
+    assert stats["context_tokens_after"] <= budget
+
+
+def test_a_budget_below_the_headers_keeps_only_the_headers():
+    context = context_builder.build_summary_context(STATE, token_budget=FIXED_COST - 1)
+    assert context["prompt_stats"]["context_tokens_after"] == FIXED_COST
+    assert context["retrieved_news"] == "- None"
+
+
+def test_a_generous_budget_drops_nothing():
+    stats = context_builder.build_summary_context(STATE, token_budget=10_000)["prompt_stats"]
+    assert stats["lines_dropped"] == 0
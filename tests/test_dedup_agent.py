@@ -0,0 +1,55 @@
+import pytest
+
+from agents import dedup_agent
+
+# Syndicated copies of one story as they appear across feeds: dropped words, rephrased terms
+SYNDICATED_VARIANTS = [
+    ("TSMC forecasts strong Q3 revenue on AI chip demand",
+     "TSMC forecasts strong third-quarter revenue on AI chip demand"),
+    ("Samsung Electronics posts a likely 10% drop in operating profit due to a chip slump",
+     "Samsung Electronics posts likely 10% drop in operating profit on chip slump"),
+    ("Apple shares rise after strong iPhone sales in China",
+     "Apple shares rise after iPhone sales in China"),
+    ("Nvidia stock hits record high as AI spending accelerates",
+     "Nvidia stock hits record as AI spending accelerates"),
+    ("Tesla recalls 2 million vehicles over Autopilot safety concerns",
+     "Tesla recalls 2 million vehicles over Autopilot concerns"),
+    ("Microsoft beats quarterly revenue estimates on cloud strength",
+     "Microsoft beats revenue estimates on cloud strength"),
+    ("台積電第三季營收創新高", "台積電第三季營收創歷史新高"),
+    ("삼성전자 3분기 영업이익 급감", "삼성전자 3분기 영업이익 급감 전망"),
+]
+
+# Different stories about the same company must stay separate documents
+DISTINCT_STORIES = [
+    ("TSMC forecasts strong Q3 revenue on AI chip demand",
+     "TSMC forecasts weak Q4 revenue on smartphone demand"),
+    ("Apple shares rise after strong iPhone sales in China",
+     "Apple faces EU antitrust fine over App Store rules"),
+    ("Nvidia stock hits record high as AI spending accelerates",
+     "Nvidia stock falls as AI chip export curbs tighten"),
+]
+
+
+@pytest.mark.parametrize("original, variant", SYNDICATED_VARIANTS)
+def test_syndicated_variants_collapse(original, variant):
+    collapsed = dedup_agent.collapse_near_duplicates([f"[A] {original}", f"[B] {variant}"])
+    assert collapsed == [f"[A, B] {original}"]
+
+
+@pytest.mark.parametrize("first, second", DISTINCT_STORIES)
+def test_distinct_stories_stay_separate(first, second):
+    assert len(dedup_agent.collapse_near_duplicates([f"[A] {first}", f"[A] {second}"])) == 2
+
+
+def test_single_word_deletions_collapse():
+    title = "Samsung Electronics shares jump as memory chip prices rebound sharply in Asia"
+    words = title.split()
+    variants = [" ".join(words[:i] + words[i + 1:]) for i in range(len(words))]
+    collapsed = dedup_agent.collapse_near_duplicates([f"[005930.KS] {title}"] + [f"[SSNLF] {v}" for v in variants])
+    assert collapsed == [f"[005930.KS, SSNLF] {title}"]
+
+
+def test_empty_titles_are_skipped():
+    collapsed = dedup_agent.collapse_near_duplicates(["[A] ", "[B]   ", "[C] ...", "[D] Apple shares rise"])
+    assert collapsed == ["[D] Apple shares rise"]
@@ -0,0 +1,74 @@
+import time
+import threading
+
+import numpy as np
+import pytest
+
+from agents import embedding_backend
+from agents.embedding_worker import EmbeddingWorker
+
+CHUNK_SECONDS = 0.02
+
+
+class _SlowEmbedder:
+    """Takes CHUNK_SECONDS per forward pass; row i of a batch is the text's number."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def encode(self, texts):
+        self.batch_sizes.append(len(texts))
+        time.sleep(CHUNK_SECONDS)
+        if any(text == "boom" for text in texts):
+            raise RuntimeError("model failed")
+        return np.array([[float(text.rsplit("-", 1)[-1])] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    embedder = _SlowEmbedder()
+    monkeypatch.setattr(embedding_backend, "get_embedder", lambda backend=None: embedder)
+    worker = EmbeddingWorker(backend="torch", max_batch_size=8, max_wait_ms=5, mode="thread")
+    worker.embedder = embedder
+    yield worker
+    worker.close()
+
+
+def test_query_does_not_wait_for_an_index_build(worker):
+    build = worker.submit([f"doc-{i}" for i in range(8 * 40)])  # 40 chunks, ~0.8s
+    time.sleep(3 * CHUNK_SECONDS)
+
+    start = time.monotonic()
+    query_vector = worker.encode(["query-7"], timeout=5)
+    query_seconds = time.monotonic() - start
+
+    assert query_vector.tolist() == [[7.0]]
+    assert query_seconds < 10 * CHUNK_SECONDS
+    assert not build.done()
+    assert build.result(timeout=5)[:, 0].tolist() == list(range(8 * 40))
+
+
+def test_concurrent_queries_share_one_forward_pass(worker):
+    results = {}
+    barrier = threading.Barrier(6)
+
+    def query(n):
+        barrier.wait()
+        results[n] = worker.encode([f"query-{n}"], timeout=5)
+
+    threads = [threading.Thread(target=query, args=(n,)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert {n: vector.tolist() for n, vector in results.items()} == {n: [[float(n)]] for n in range(6)}
+    assert len(worker.embedder.batch_sizes) < 6
+
+
+def test_encode_errors_reach_the_caller(worker):
+    with pytest.raises(RuntimeError, match="model failed"):
+        worker.encode(["boom"], timeout=5)
+    with pytest.raises(RuntimeError, match="model failed"):
+        worker.encode([f"doc-{i}" for i in range(20)] + ["boom"], timeout=5)
+    assert worker.encode(["query-1"], timeout=5).tolist() == [[1.0]]
@@ -0,0 +1,73 @@
+import json
+import hashlib
+
+import numpy as np
+import pytest
+
+from agents import retriever_agent, embedding_worker
+
+
+class _HashEncoder:
+    """Deterministic stand-in for the embedding model: one pseudo-random unit vector per text."""
+
+    def encode(self, texts):
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "big")
+            vector = np.random.default_rng(seed).standard_normal(16)
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.asarray(vectors, dtype=np.float32)
+
+
+@pytest.fixture
+def index_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(retriever_agent, "INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(retriever_agent, "CURRENT_POINTER_PATH", str(tmp_path / "CURRENT.json"))
+    monkeypatch.setattr(retriever_agent, "_loaded", retriever_agent.OrderedDict())
+    monkeypatch.setattr(embedding_worker, "get_embedding_worker", lambda: _HashEncoder())
+    return tmp_path
+
+
+OLD_HEADLINES = ["[TSM] TSMC forecasts strong Q3 revenue", "[AAPL] Apple shares rise after iPhone sales"]
+NEW_HEADLINES = ["[TSM] TSMC shares fall on export curbs", "[AAPL] Apple faces EU antitrust fine"]
+
+
+def test_retrieval_searches_the_requested_version_not_the_published_one(index_store):
+    old_version = retriever_agent.ensure_index(OLD_HEADLINES)
+    new_version = retriever_agent.ensure_index(NEW_HEADLINES)
+    retriever_agent.publish_version(new_version)
+
+    # A request that built the old version keeps searching it after a newer one is published
+    old_results = retriever_agent.retrieve_top_k(OLD_HEADLINES[0], k=2, version=old_version)
+    assert old_results["documents"][0] == OLD_HEADLINES[0]
+    assert set(old_results["documents"]) == set(OLD_HEADLINES)
+    # Without a version, the published one is searched
+    assert set(retriever_agent.retrieve_top_k(NEW_HEADLINES[0], k=2)["documents"]) == set(NEW_HEADLINES)
+
+
+def test_ensure_index_reuses_a_stored_version_without_publishing(index_store, monkeypatch):
+    version = retriever_agent.ensure_index(OLD_HEADLINES)
+    assert retriever_agent.published_version() is None
+
+    monkeypatch.setattr(retriever_agent, "create_and_store_embeddings", pytest.fail)
+    assert retriever_agent.ensure_index(list(reversed(OLD_HEADLINES))) == version
+
+
+def test_publish_points_current_at_a_complete_version(index_store):
+    version = retriever_agent.ensure_index(OLD_HEADLINES)
+    retriever_agent.publish_version(version)
+
+    pointer = json.loads((index_store / "CURRENT.json").read_text())
+    assert pointer["version"] == version and pointer["count"] == len(OLD_HEADLINES)
+    assert sorted(path.name for path in (index_store / version).iterdir()) == ["documents.pkl", "index.faiss", "meta.json"]
+    assert retriever_agent.published_documents() == OLD_HEADLINES
+    assert not [path for path in index_store.iterdir() if path.name.startswith(".build-")]
+
+
+def test_workers_fall_back_to_the_published_version(index_store, monkeypatch):
+    version = retriever_agent.ensure_index(OLD_HEADLINES)
+    retriever_agent.publish_version(version)
+    monkeypatch.setattr(retriever_agent, "READ_ONLY", True)
+
+    assert retriever_agent.ensure_index(OLD_HEADLINES) == version
+    assert retriever_agent.ensure_index(NEW_HEADLINES) == version
@@ -0,0 +1,34 @@
+import os
+import glob
+
+import feedparser
+import pytest
+
+from agents import rss_parser
+
+FIXTURES = sorted(glob.glob(os.path.join(rss_parser.FIXTURES_DIR, "*.xml")))
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_fixtures_cover_every_portfolio_language():
+    languages = {os.path.basename(path).rsplit("_", 1)[1][:-len(".xml")] for path in FIXTURES}
+    assert {"zh-Hant", "ko-KR", "en-US"} <= languages
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+def test_titles_match_feedparser(path):
+    content = _read(path)
+    titles = [item["title"] for item in rss_parser.parse_items(content)]
+    assert titles
+    assert titles == [entry.title for entry in feedparser.parse(content).entries]
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+def test_parsing_stops_at_first_seen_item(path):
+    items = rss_parser.parse_items(_read(path))
+    seen_keys = {rss_parser.item_key(items[2])}
+    assert rss_parser.parse_items(_read(path), seen_keys=seen_keys) == items[:2]
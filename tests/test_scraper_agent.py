@@ -0,0 +1,111 @@
+import os
+import time
+import threading
+
+import pytest
+import requests
+
+from agents import rss_parser, scraper_agent
+
+FEED = open(os.path.join(rss_parser.FIXTURES_DIR, "TCEHY_en-US.xml"), "rb").read()
+PORTFOLIO = {"TCEHY": {"region": "US", "lang": "en-US"}}
+URL = f"{scraper_agent.YAHOO_RSS_URL}?s=TCEHY&region=US&lang=en-US"
+
+
+@pytest.fixture(autouse=True)
+def fresh_feed_state(monkeypatch):
+    monkeypatch.setattr(scraper_agent, "_feeds", {})
+
+
+def _serve(monkeypatch, fetch):
+    calls = []
+
+    def fetch_once(url):
+        calls.append(url)
+        return fetch(len(calls))
+
+    monkeypatch.setattr(scraper_agent, "_fetch_once", fetch_once)
+    return calls
+
+
+def test_breaker_opens_after_threshold_and_serves_last_good(monkeypatch):
+    monkeypatch.setattr(scraper_agent, "BREAKER_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(scraper_agent, "BREAKER_COOLDOWN_SECONDS", 60)
+
+    def fetch(call):
+        if call == 1:
+            return FEED, None
+        raise requests.exceptions.ConnectionError("feed down")
+
+    calls = _serve(monkeypatch, fetch)
+    good = scraper_agent.get_earnings_surprises(PORTFOLIO)
+    assert good
+
+    for _ in range(3):
+        assert scraper_agent.get_earnings_surprises(PORTFOLIO) == good
+    assert len(calls) == 4
+    stats = scraper_agent.feed_stats()[URL]
+    assert stats["circuit_open"] and stats["consecutive_failures"] == 3
+
+    # While open, the feed is not requested at all
+    assert scraper_agent.get_earnings_surprises(PORTFOLIO) == good
+    assert len(calls) == 4
+    assert scraper_agent.feed_stats()[URL]["served_stale"] == 4
+
+
+def test_slow_feed_returns_stale_headlines_within_the_deadline(monkeypatch):
+    monkeypatch.setattr(scraper_agent, "SCRAPE_DEADLINE_SECONDS", 0.2)
+    release = threading.Event()
+
+    def fetch(call):
+        if call > 1:
+            release.wait(5)  # Far slower than the deadline
+        return FEED, None
+
+    _serve(monkeypatch, fetch)
+    good = scraper_agent.get_earnings_surprises(PORTFOLIO)
+
+    start = time.monotonic()
+    stale = scraper_agent.get_earnings_surprises(PORTFOLIO)
+    elapsed = time.monotonic() - start
+    release.set()
+
+    assert stale == good
+    assert elapsed < 0.2 + 0.3
+    assert scraper_agent.feed_stats()[URL]["served_stale"] == 1
+
+
+def test_hedge_fires_only_with_enough_latency_samples(monkeypatch):
+    monkeypatch.setattr(scraper_agent, "HEDGE_MIN_SAMPLES", 20)
+    slow_calls = set()
+    release = threading.Event()
+
+    def fetch(call):
+        if call in slow_calls:
+            release.wait(5)
+        return FEED, None
+
+    calls = _serve(monkeypatch, fetch)
+    health = scraper_agent._feed_health(URL)
+
+    # 19 samples: one short of the minimum, so a slow request is not hedged
+    for _ in range(19):
+        scraper_agent._scrape_feed("TCEHY", URL)
+    slow_calls.add(len(calls) + 1)
+    threading.Timer(0.2, release.set).start()
+    scraper_agent._scrape_feed("TCEHY", URL)
+    assert health.hedges == 0
+    assert len(calls) == 20
+
+    # 20 samples: the next slow request gets a duplicate that wins the race
+    release.clear()
+    slow_calls.add(len(calls) + 1)
+    start = time.monotonic()
+    headlines = scraper_agent._scrape_feed("TCEHY", URL)
+    elapsed = time.monotonic() - start
+    release.set()
+
+    assert headlines
+    assert health.hedges == 1
+    assert len(calls) == 22
+    assert elapsed < 1
@@ -0,0 +1,78 @@
+import sqlite3
+from typing import TypedDict
+
+import pytest
+from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agents import retriever_agent
+from orchestrator import graph, sessions
+from orchestrator.sessions import SessionManager
+
+
+class _State(TypedDict):
+    turns: int
+
+
+def _app(checkpointer):
+    workflow = StateGraph(_State)
+    workflow.add_node("turn", lambda state: {"turns": state.get("turns", 0) + 1})
+    workflow.set_entry_point("turn")
+    workflow.add_edge("turn", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def _threads(checkpointer) -> set:
+    return {checkpoint.config["configurable"]["thread_id"] for checkpoint in checkpointer.list(None)}
+
+
+class _NoScanSaver(InMemorySaver):
+    def list(self, *args, **kwargs):
+        raise AssertionError("the sweep must not scan the checkpoints")
+
+
+def test_sweep_reads_the_last_seen_table_not_the_checkpoints(monkeypatch):
+    checkpointer = _NoScanSaver()
+    manager = SessionManager(checkpointer, ttl_seconds=60)
+    monkeypatch.setattr(sessions.time, "time", lambda: 1_000.0)
+    _app(checkpointer).invoke({"turns": 0}, manager.touch("idle"))
+    monkeypatch.setattr(sessions.time, "time", lambda: 1_100.0)
+    _app(checkpointer).invoke({"turns": 0}, manager.touch("recent"))
+
+    manager.evict_expired()
+
+    assert set(checkpointer.storage) == {"recent"}
+    assert manager.stats()["evicted"] == 1 and manager.stats()["active"] == 1
+
+
+def test_idle_sessions_are_evicted_after_a_restart(tmp_path, monkeypatch):
+    SqliteSaver = pytest.importorskip("langgraph.checkpoint.sqlite").SqliteSaver
+    path = str(tmp_path / "sessions.sqlite")
+    before = SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+    manager = SessionManager(before, ttl_seconds=60, last_seen_path=path)
+    monkeypatch.setattr(sessions.time, "time", lambda: 1_000.0)
+    _app(before).invoke({"turns": 0}, manager.touch("idle"))
+    monkeypatch.setattr(sessions.time, "time", lambda: 1_100.0)
+    _app(before).invoke({"turns": 0}, manager.touch("recent"))
+
+    # A new process: nothing in memory, only the persisted checkpoints
+    after = SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+    restarted = SessionManager(after, ttl_seconds=60, last_seen_path=path)
+    restarted.evict_expired()
+
+    assert _threads(after) == {"recent"}
+    assert restarted.stats()["evicted"] == 1 and restarted.stats()["active"] == 1
+
+
+def test_follow_up_searches_the_session_index_version(monkeypatch):
+    monkeypatch.setattr(retriever_agent, "has_version", lambda version, documents_hash=None: version == "abc-v1")
+    monkeypatch.setattr(retriever_agent, "ensure_index", pytest.fail)
+    searched = []
+    monkeypatch.setattr(retriever_agent, "retrieve_top_k",
+                        lambda query, k, version: searched.append(version) or {"documents": ["[A] x"], "scores": [0.1]})
+
+    state = {"user_query": "How is A doing?", "scraped_headlines": ["[A] x"], "corpus_hash": "abc", "index_version": "abc-v1"}
+    update = graph.retrieve_relevant_news(state)
+
+    assert searched == ["abc-v1"]
+    assert update["index_version"] == "abc-v1"
@@ -0,0 +1,83 @@
+import time
+import threading
+
+import pytest
+
+from orchestrator.singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def _run_concurrently(target) -> list:
+    outcomes = [None] * CALLERS
+
+    def caller(n):
+        try:
+            outcomes[n] = ("result", target())
+        except Exception as e:
+            outcomes[n] = ("error", e)
+
+    threads = [threading.Thread(target=caller, args=(n,)) for n in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return outcomes
+
+
+def _leader_blocks_until_all_arrive(flight: SingleFlight, release: threading.Event):
+    """Releases the leader once every other caller is waiting on its call."""
+    def watch():
+        while flight.stats()["by_kind"].get("scrape", {}).get("coalesced", 0) < CALLERS - 1:
+            time.sleep(0.001)
+        release.set()
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def scrape(portfolio):
+        calls.append(portfolio)
+        release.wait(5)
+        return ["[TSM] headline"]
+
+    _leader_blocks_until_all_arrive(flight, release)
+    outcomes = _run_concurrently(lambda: flight.do("scrape", "key-1", scrape, "portfolio"))
+
+    assert calls == ["portfolio"]
+    assert outcomes == [("result", ["[TSM] headline"])] * CALLERS
+    stats = flight.stats()
+    assert stats["in_flight"] == 0
+    assert stats["by_kind"]["scrape"] == {"executed": 1, "coalesced": CALLERS - 1,
+                                          "coalesced_ratio": round((CALLERS - 1) / CALLERS, 3)}
+
+
+def test_leader_exception_reaches_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def scrape():
+        release.wait(5)
+        raise RuntimeError("feed down")
+
+    _leader_blocks_until_all_arrive(flight, release)
+    outcomes = _run_concurrently(lambda: flight.do("scrape", "key-1", scrape))
+
+    assert [kind for kind, _ in outcomes] == ["error"] * CALLERS
+    assert all(str(error) == "feed down" for _, error in outcomes)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_finished_calls_are_not_cached_and_keys_are_independent():
+    flight = SingleFlight()
+    assert flight.do("scrape", "key-1", lambda: 1) == 1
+    assert flight.do("scrape", "key-1", lambda: 2) == 2
+    assert flight.do("scrape", "key-2", lambda: 3) == 3
+    with pytest.raises(ValueError):
+        flight.do("index", "key-1", int, "not a number")
+    assert flight.stats()["by_kind"]["scrape"]["executed"] == 3
+    assert flight.stats()["by_kind"]["scrape"]["coalesced"] == 0
+    assert flight.stats()["by_kind"]["index"]["executed"] == 1